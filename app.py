@@ -5,16 +5,38 @@ Tout en un seul fichier. Dynamique depuis l'API Sydia.
 
 Usage:
     pipenv run python app.py
+    pipenv run uvicorn asgi:application --port 5000   (mode ASGI, voir asgi.py)
+    pipenv run python sydia_simulator.py               (Sydia local : SYDIA_API_URL=http://127.0.0.1:8800)
 """
 
 import os
+import re
 import json
+import time
+import random
+import logging
+import logging.handlers
+import sqlite3
+import base64
+import bisect
+import hashlib
+import queue
+import tempfile
+import atexit
 import asyncio
+import contextlib
+import copy
+import threading
+import contextvars
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urlencode, quote_from_bytes
 import httpx
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, render_template_string, request, jsonify, send_file
 from flask_socketio import SocketIO, emit
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
 
 
 MODELES_MAIL_SYDIA = {
@@ -92,36 +114,1758 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'sydia-mcp-secret-key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-azure_client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
-)
 MODEL = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME", "gpt-4.1-nano")
 
+# Client LLM asynchrone
+AZURE_OPENAI_TIMEOUT = float(os.getenv("AZURE_OPENAI_TIMEOUT", "60"))
+AZURE_OPENAI_CONNECT_TIMEOUT = float(os.getenv("AZURE_OPENAI_CONNECT_TIMEOUT", "10"))
+AZURE_OPENAI_MAX_RETRIES = int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "2"))
+AZURE_OPENAI_MAX_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "50"))
+AZURE_OPENAI_MAX_KEEPALIVE = int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE", "10"))
+
 SYDIA_URL = os.getenv("SYDIA_API_URL", "https://preprod.sydia.fr")
 SYDIA_TOKEN = os.getenv("SYDIA_API_TOKEN", "")
 
-conversations = {}
+# Pool de connexions HTTP vers Sydia
+SYDIA_TIMEOUT = float(os.getenv("SYDIA_TIMEOUT", "30"))
+SYDIA_MAX_CONNECTIONS = int(os.getenv("SYDIA_MAX_CONNECTIONS", "100"))
+SYDIA_MAX_KEEPALIVE = int(os.getenv("SYDIA_MAX_KEEPALIVE", "20"))
+SYDIA_KEEPALIVE_EXPIRY = float(os.getenv("SYDIA_KEEPALIVE_EXPIRY", "30"))
+SYDIA_HTTP2 = os.getenv("SYDIA_HTTP2", "0").lower() in ("1", "true", "yes")
 
+# Exécution des outils d'un même tour LLM
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+SERIAL_TOOLS = {
+    t.strip() for t in os.getenv(
+        "SERIAL_TOOLS",
+        "add_sinistre,add_document,update_assure,contact_gestionnaire,cloturer_sinistre"
+    ).split(",") if t.strip()
+}
 
-async def sydia_call(endpoint: str, data: dict = None) -> dict:
-    """Appelle l'API Sydia"""
-    if data is None:
-        data = {}
-    data["token"] = SYDIA_TOKEN
+# Boucle LLM ↔ outils d'un tour de conversation
+CHAT_MAX_TOOL_ROUNDS = int(os.getenv("CHAT_MAX_TOOL_ROUNDS", "5"))
+CHAT_TURN_BUDGET = float(os.getenv("CHAT_TURN_BUDGET", "90"))
+
+# Historique des conversations
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000"))
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", "3600"))
+CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Fenêtre de contexte envoyée au modèle
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "3"))
+CONTEXT_TOOL_SUMMARY_CHARS = int(os.getenv("CONTEXT_TOOL_SUMMARY_CHARS", "300"))
+
+# Miroir SQLite local des sinistres (désactivé si SYDIA_MIRROR_PATH est vide)
+SYDIA_MIRROR_PATH = os.getenv("SYDIA_MIRROR_PATH", "")
+SYDIA_MIRROR_SYNC_INTERVAL = float(os.getenv("SYDIA_MIRROR_SYNC_INTERVAL", "300"))
+SYDIA_MIRROR_MAX_AGE = float(os.getenv("SYDIA_MIRROR_MAX_AGE", "900"))
+
+# Préchargement après identification réussie
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1").lower() in ("1", "true", "yes")
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "30"))
+PREFETCH_CACHE_SIZE = int(os.getenv("PREFETCH_CACHE_SIZE", "256"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "3"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "30"))
+
+# Index ref ↔ id des sinistres
+SINISTRE_INDEX_SIZE = int(os.getenv("SINISTRE_INDEX_SIZE", "50000"))
+
+# Taille des pages pour les parcours complets de sinistre/list
+SINISTRES_PAGE_SIZE = int(os.getenv("SINISTRES_PAGE_SIZE", "500"))
+
+# Upload en flux (/api/upload/stream)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD", str(1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+UPLOAD_CHUNK_SIZE = 3 * 64 * 1024  # multiple de 3 : base64 sans padding intermédiaire
+
+# Cache disque des PDF générés (generate_document)
+DOCUMENT_CACHE_DIR = os.getenv("DOCUMENT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "sydia-documents")
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+DOCUMENT_CACHE_MAX_AGE = float(os.getenv("DOCUMENT_CACHE_MAX_AGE", "3600"))  # données Sydia modifiées hors de l'agent
+
+# Statistiques du tableau de bord (stale-while-revalidate)
+STATS_TTL = float(os.getenv("STATS_TTL", "300"))  # clôture/déclaration par l'agent : recalcul immédiat
+STATS_MAX_STALE = float(os.getenv("STATS_MAX_STALE", "3600"))
+
+# Cache des sinistres (get_sinistre)
+SINISTRE_CACHE_SIZE = int(os.getenv("SINISTRE_CACHE_SIZE", "512"))
+SINISTRE_CACHE_TTL = float(os.getenv("SINISTRE_CACHE_TTL", "60"))
+
+# Journalisation (DEBUG : dumps des réponses Sydia, tronqués et échantillonnés)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text | json
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "500"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+
+# Attributs standard d'un LogRecord : le reste vient de `extra=` et est sérialisé
+_LOG_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Une ligne par événement : texte 'clé=valeur' ou JSON (LOG_FORMAT)"""
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.fmt = fmt
+    
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {k: v for k, v in vars(record).items() if k not in _LOG_RECORD_ATTRS}
+        if self.fmt == "json":
+            entry = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": record.getMessage(),
+                **fields
+            }
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class DebugSampler(logging.Filter):
+    """Ne garde qu'une fraction des messages DEBUG (les autres niveaux passent tous)"""
+    
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class Payload:
+    """
+    Données Sydia à journaliser, rendues seulement si le message est émis
+    
+    Les contenus de fichiers (base64, binaire) et le token sont masqués,
+    le tout est tronqué à LOG_PAYLOAD_CHARS caractères.
+    """
+    
+    __slots__ = ("value",)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    @classmethod
+    def _redact(cls, value):
+        if isinstance(value, dict):
+            return {
+                k: "***" if k == "token"
+                else f"<{len(v)} octets>" if k == "content" and isinstance(v, (str, bytes)) and len(v) > 64
+                else cls._redact(v)
+                for k, v in value.items()
+            }
+        if isinstance(value, list):
+            return [cls._redact(v) for v in value]
+        if isinstance(value, (bytes, bytearray)):
+            return f"<{len(value)} octets>"
+        return value
+    
+    def __str__(self) -> str:
+        text = str(self._redact(self.value))
+        if len(text) > LOG_PAYLOAD_CHARS:
+            return f"{text[:LOG_PAYLOAD_CHARS]}… (+{len(text) - LOG_PAYLOAD_CHARS} car.)"
+        return text
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Empile l'enregistrement sans le formater
+    
+    prepare() d'origine rend le message (Payload compris) et l'exception dans
+    le thread appelant ; ici msg, args et exc_info partent tels quels et
+    c'est le thread du QueueListener qui formate.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+log = logging.getLogger("sydia")
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Logger 'sydia' → file d'attente → thread d'écriture sur stderr
+    
+    L'appelant ne fait qu'empiler l'enregistrement ; le formatage et les
+    écritures (lentes, synchrones) sont faits par le QueueListener.
+    """
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    
+    log.setLevel(LOG_LEVEL)
+    log.addHandler(DeferredQueueHandler(log_queue))
+    log.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+    log.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+_log_listener = setup_logging()
+
+
+# =========================================================================
+# MÉTRIQUES (format texte Prometheus, servi sur /metrics)
+# =========================================================================
+
+METRICS = []
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _metric_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        METRICS.append(self)
+    
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_metric_labels(dict(zip(self.labels, key)))} {value}")
+        return lines
+
+
+class Gauge:
+    """Valeur instantanée : fixée par inc/dec, ou lue via `fn` au moment du rendu"""
+    
+    def __init__(self, name: str, help: str, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0
+        METRICS.append(self)
+    
+    def inc(self, amount: float = 1):
+        self.value += amount
+    
+    def dec(self, amount: float = 1):
+        self.value -= amount
+    
+    def render(self) -> list:
+        value = self.fn() if self.fn else self.value
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # labels → [compte par bucket..., somme, total]
+        self._lock = threading.Lock()
+        METRICS.append(self)
+    
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(zip(self.labels, key))
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_metric_labels({**labels, 'le': bound})} {count}")
+                lines.append(f"{self.name}_bucket{_metric_labels({**labels, 'le': '+Inf'})} {series[-1]}")
+                lines.append(f"{self.name}_sum{_metric_labels(labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_metric_labels(labels)} {series[-1]}")
+        return lines
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+sydia_request_seconds = Histogram(
+    "sydia_request_duration_seconds", "Durée des appels HTTP à l'API Sydia", ("endpoint", "status")
+)
+sydia_cache_hits = Counter(
+    "sydia_cache_hits_total", "Appels Sydia servis sans requête HTTP", ("endpoint", "source")
+)
+tool_seconds = Histogram(
+    "tool_duration_seconds", "Durée d'exécution des outils de l'agent", ("tool", "outcome")
+)
+llm_request_seconds = Histogram(
+    "llm_request_duration_seconds", "Durée des appels au LLM", ("model", "mode")
+)
+llm_tokens = Counter(
+    "llm_tokens_total", "Tokens consommés par les appels au LLM", ("model", "kind", "source")
+)
+socketio_clients = Gauge("socketio_clients", "Clients Socket.IO connectés")
+
+
+# =========================================================================
+# TRACES (spans par tour de conversation, format OTLP/JSON)
+# =========================================================================
+
+# Export désactivé si aucune destination : span() ne coûte alors presque rien
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")  # ex: http://localhost:4318/v1/traces
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "sydia-agent")
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "256"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "2"))
+
+# Attributs recopiés du parent vers chaque span enfant
+TRACE_CORRELATION = ("session_id", "turn_id")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, parent=None, attributes: dict = None):
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attributes = {k: parent.attributes[k] for k in TRACE_CORRELATION
+                           if parent and k in parent.attributes}
+        self.attributes.update(attributes or {})
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+    
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+    
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class TraceExporter:
+    """
+    Exporte les spans terminés par lots, depuis un thread dédié
+    
+    Chaque lot est une requête OTLP/JSON (ExportTraceServiceRequest) :
+    ajoutée comme une ligne au fichier JSONL (format du file exporter
+    OpenTelemetry) et/ou envoyée au collecteur OTLP/HTTP.
+    """
+    
+    def __init__(self, jsonl_path: str = "", otlp_endpoint: str = ""):
+        self.jsonl_path = jsonl_path
+        self.otlp_endpoint = otlp_endpoint
+        self.exported = 0
+        self.failed = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+    
+    def export(self, span: Span):
+        self._queue.put(span)
+    
+    def _run(self):
+        client = httpx.Client(timeout=10.0) if self.otlp_endpoint else None
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + TRACE_FLUSH_INTERVAL
+            while len(batch) < TRACE_BATCH_SIZE:
+                try:
+                    span = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                self._flush(batch, client)
+        if client is not None:
+            client.close()
+    
+    def _flush(self, batch: list, client):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "sydia"}, "spans": [s.to_otlp() for s in batch]}]
+        }]}
+        try:
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            if client is not None:
+                client.post(self.otlp_endpoint, json=payload).raise_for_status()
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            log.warning("Export des traces échoué: %s", e)
+    
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=TRACE_FLUSH_INTERVAL + 10)
+
+
+trace_exporter = (
+    TraceExporter(TRACE_JSONL_PATH, TRACE_OTLP_ENDPOINT)
+    if TRACE_JSONL_PATH or TRACE_OTLP_ENDPOINT else None
+)
+if trace_exporter is not None:
+    atexit.register(trace_exporter.shutdown)
+
+
+def span(name: str, root: bool = False, **attributes):
+    """
+    Span enfant du span courant (contextvar, suit les tâches asyncio)
+    
+    Hors d'une trace (pas de span courant et root=False), ou si l'export est
+    désactivé, renvoie un span inerte.
+    """
+    parent = _current_span.get()
+    if trace_exporter is None or (parent is None and not root):
+        return contextlib.nullcontext(_NOOP_SPAN)
+    return _record_span(Span(name, parent, attributes))
+
+
+@contextlib.contextmanager
+def _record_span(current: Span):
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        trace_exporter.export(current)
+
+# =========================================================================
+# SERVER-TIMING (répartition du temps d'une requête HTTP)
+# =========================================================================
+
+_server_timing = contextvars.ContextVar("server_timing", default=None)
+
+
+class ServerTiming:
+    """
+    Temps passé par catégorie pendant une requête (en-tête Server-Timing)
+    
+    llm et tool : temps réel des appels ; sydia : cumul des attentes d'appels
+    HTTP, qui peuvent se chevaucher quand les outils tournent en parallèle (un
+    appel fusionné compte pour chaque requête qui l'attend, un préchargement
+    pour aucune).
+    """
+    
+    # ASCII uniquement : valeurs d'en-tête HTTP
+    LABELS = {
+        "llm": "LLM",
+        "tool": "Outils",
+        "sydia": "Sydia (cumul)",
+        "serialize": "Serialisation JSON",
+        "total": "Total",
+    }
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {}
+    
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+    
+    @contextlib.contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+    
+    async def run(self, coro):
+        """Exécute coro en y rattachant ce chronométrage (hérité par les sous-tâches)"""
+        token = _server_timing.set(self)
+        try:
+            return await coro
+        finally:
+            _server_timing.reset(token)
+    
+    def summary(self) -> dict:
+        """Durées en millisecondes, total compris"""
+        durations = {**self.durations, "total": time.perf_counter() - self.start}
+        return {name: round(seconds * 1000, 1) for name, seconds in durations.items()}
+    
+    def header(self) -> str:
+        return ", ".join(
+            f'{name};dur={ms};desc="{self.LABELS.get(name, name)}"'
+            for name, ms in self.summary().items()
+        )
+
+
+def record_timing(name: str, seconds: float):
+    timing = _server_timing.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+# Usage (tokens) en fin de flux : nécessite AZURE_OPENAI_API_VERSION >= 2024-09-01-preview
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "0").lower() in ("1", "true", "yes")
+
+# Un client par boucle asyncio : un httpx.AsyncClient ne peut pas changer de boucle
+_sydia_clients = {}
+
+
+def get_sydia_client() -> httpx.AsyncClient:
+    """Retourne le client Sydia (keep-alive) de la boucle courante"""
+    loop = asyncio.get_running_loop()
+    client = _sydia_clients.get(loop)
+    
+    if client is None or client.is_closed:
+        http2 = SYDIA_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                log.warning("SYDIA_HTTP2 activé mais le paquet 'h2' est absent → HTTP/1.1")
+                http2 = False
+        
+        client = httpx.AsyncClient(
+            timeout=SYDIA_TIMEOUT,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=SYDIA_MAX_CONNECTIONS,
+                max_keepalive_connections=SYDIA_MAX_KEEPALIVE,
+                keepalive_expiry=SYDIA_KEEPALIVE_EXPIRY
+            )
+        )
+        _sydia_clients[loop] = client
+    return client
+
+
+async def close_sydia_client():
+    """Ferme le client Sydia de la boucle courante (hook d'arrêt)"""
+    client = _sydia_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+# Même principe pour le client Azure OpenAI (pool httpx interne lié à la boucle)
+_azure_clients = {}
+
+
+def get_azure_client() -> AsyncAzureOpenAI:
+    """Retourne le client Azure OpenAI asynchrone de la boucle courante"""
+    loop = asyncio.get_running_loop()
+    client = _azure_clients.get(loop)
+    
+    if client is None:
+        client = AsyncAzureOpenAI(
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
+            timeout=httpx.Timeout(AZURE_OPENAI_TIMEOUT, connect=AZURE_OPENAI_CONNECT_TIMEOUT),
+            max_retries=AZURE_OPENAI_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=AZURE_OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=AZURE_OPENAI_MAX_KEEPALIVE
+                )
+            )
+        )
+        _azure_clients[loop] = client
+    return client
+
+
+async def close_azure_client():
+    """Ferme le client Azure OpenAI de la boucle courante"""
+    client = _azure_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+async def close_clients():
+    """Ferme tous les clients HTTP de la boucle courante"""
+    await close_sydia_client()
+    await close_azure_client()
+
+
+# Boucle asyncio de fond, partagée par toutes les requêtes : les clients HTTP,
+# caches et requêtes en cours qui lui sont liés vivent d'une requête à l'autre
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Retourne la boucle de fond (démarrée au premier appel)"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="sydia-asyncio", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def submit_async(coro) -> Future:
+    """Planifie une coroutine sur la boucle de fond sans attendre"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def wait_future(future: Future, timeout: float = None):
+    """Attend un Future de la boucle de fond ; sous gevent, cède la main au hub au lieu de le bloquer"""
+    if not socketio.async_mode.startswith('gevent'):
+        return future.result(timeout)
+    import gevent
+    from gevent.event import Event
+    done = Event()
+    # Watcher 'async' : seul réveil du hub sûr depuis un autre thread, et le garde en vie pendant l'attente
+    watcher = gevent.get_hub().loop.async_()
+    watcher.start(done.set)
+    lock = threading.Lock()
+    closed = False
+
+    def wake(f):
+        with lock:  # le callback peut arriver après un timeout, watcher déjà fermé
+            if not closed:
+                watcher.send()
+
+    future.add_done_callback(wake)
+    try:
+        done.wait(timeout)
+    finally:
+        with lock:
+            closed = True
+            watcher.close()
+    return future.result(0)
+
+
+def run_async(coro, timeout: float = None):
+    """Exécute une coroutine sur la boucle de fond et attend son résultat"""
+    return wait_future(submit_async(coro), timeout)
+
+
+def shutdown_loop():
+    """Ferme les clients puis arrête la boucle de fond (hook d'arrêt)"""
+    global _loop
+    with _loop_lock:
+        loop, _loop = _loop, None
+    if loop is None or not loop.is_running():
+        return
+    
+    async def cleanup():
+        prefetcher.cancel()
+        await close_clients()
+        await loop.shutdown_asyncgens()
+    
+    try:
+        asyncio.run_coroutine_threadsafe(cleanup(), loop).result(10)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(shutdown_loop)
+
+
+# Endpoints en lecture seule : les appels identiques simultanés partagent une requête
+SYDIA_READ_ENDPOINTS = {
+    "sinistre/get",
+    "sinistre/list",
+    "sinistre/checklist/get",
+    "sinistre/reglement/list",
+    "ged/list",
+    "ged/get",
+}
+
+# (boucle, endpoint, payload) → requête en cours
+_sydia_inflight = {}
+sydia_coalesced = 0
+
+
+@contextlib.contextmanager
+def sydia_timer(endpoint: str):
+    """Mesure un appel HTTP Sydia ; l'appelant renseigne timer["status"]"""
+    timer = {"status": "error"}
+    start = time.perf_counter()
+    with span("sydia_call", endpoint=endpoint) as current:
+        try:
+            yield timer
+        finally:
+            elapsed = time.perf_counter() - start
+            current.set(status=timer["status"])
+            sydia_request_seconds.observe(elapsed, endpoint=endpoint, status=timer["status"])
+            record_timing("sydia", elapsed)
+
+
+async def _sydia_post(endpoint: str, data: dict) -> dict:
+    with sydia_timer(endpoint) as timer:
+        response = await get_sydia_client().post(
             f"{SYDIA_URL}/api/v2/{endpoint}",
             data=data,
             headers={"Content-Type": "application/x-www-form-urlencoded"}
         )
+        timer["status"] = response.status_code
     return response.json()
 
 
-async def get_sinistre(id_sinistre: int = None, ref_sinistre: str = None) -> dict:
-    """Récupère un sinistre"""
+def check_upload_content(content):
+    """Refuse une chaîne, ambiguë entre chemin et contenu (→ pathlib.Path ou bytes)"""
+    if isinstance(content, str):
+        raise TypeError("content: bytes, os.PathLike ou fichier binaire attendu, pas str")
+
+
+async def upload_chunks(content):
+    """
+    Découpe un contenu à envoyer en morceaux de taille multiple de 3
+    
+    content : bytes, chemin (os.PathLike), fichier ouvert en binaire ou flux
+    asynchrone d'octets. Le fichier est lu au fil de l'envoi, jamais en entier.
+    """
+    check_upload_content(content)
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        view = memoryview(content)
+        for start in range(0, len(view), UPLOAD_CHUNK_SIZE):
+            yield view[start:start + UPLOAD_CHUNK_SIZE]
+        return
+    
+    if isinstance(content, os.PathLike):
+        fileobj = await asyncio.to_thread(open, content, "rb")
+        try:
+            async for chunk in upload_chunks(fileobj):
+                yield chunk
+        finally:
+            fileobj.close()
+        return
+    
+    if hasattr(content, "read"):
+        # Lectures courtes possibles (flux brut, tube, socket) : traitées comme un flux
+        async def reads(fileobj):
+            while chunk := await asyncio.to_thread(fileobj.read, UPLOAD_CHUNK_SIZE):
+                yield chunk
+        content = reads(content)
+    
+    # Flux : morceaux de taille quelconque, on garde le reste (< 3 octets)
+    rest = b""
+    async for chunk in content:
+        chunk = rest + chunk
+        cut = len(chunk) - len(chunk) % 3
+        rest = chunk[cut:]
+        if cut:
+            yield chunk[:cut]
+    if rest:
+        yield rest
+
+
+async def sydia_upload(endpoint: str, data: dict, content) -> dict:
+    """
+    POST Sydia avec un fichier encodé en base64 à la volée
+    
+    Le champ 'content' est produit par morceaux (voir upload_chunks) : ni le
+    fichier ni sa version base64 ne sont chargés entiers en mémoire.
+    """
+    check_upload_content(content)  # avant d'ouvrir la requête
+    data = {**data, "token": SYDIA_TOKEN}
+    
+    async def body():
+        yield (urlencode(data) + "&content=").encode()
+        async for chunk in upload_chunks(content):
+            yield quote_from_bytes(base64.b64encode(chunk), safe="").encode()
+    
+    async def post():
+        with sydia_timer(endpoint) as timer:
+            response = await get_sydia_client().post(
+                f"{SYDIA_URL}/api/v2/{endpoint}",
+                content=body(),
+                headers={"Content-Type": "application/x-www-form-urlencoded"}
+            )
+            timer["status"] = response.status_code
+        return response.json()
+    
+    return await _sydia_write(post())
+
+
+async def _untimed(coro):
+    """Exécute coro hors de tout chronométrage et de toute trace (contexte propre à la tâche)"""
+    _server_timing.set(None)
+    _current_span.set(None)
+    return await coro
+
+
+async def _sydia_write(coro):
+    """
+    Écriture Sydia : les lectures en cours (lancées avant ou pendant
+    l'écriture) ne sont plus partagées avec les lectures qui suivent
+    """
+    _sydia_inflight.clear()
+    try:
+        return await coro
+    finally:
+        _sydia_inflight.clear()
+
+
+def _sydia_inflight_done(key, task):
+    if _sydia_inflight.get(key) is task:
+        del _sydia_inflight[key]
+    if not task.cancelled():
+        task.exception()  # évite "exception was never retrieved" si plus personne n'attend
+
+
+async def sydia_call(endpoint: str, data: dict = None) -> dict:
+    """Appelle l'API Sydia (lectures identiques simultanées fusionnées)"""
+    global sydia_coalesced
+    if data is None:
+        data = {}
+    data["token"] = SYDIA_TOKEN
+    
+    if endpoint not in SYDIA_READ_ENDPOINTS:
+        return await _sydia_write(_sydia_post(endpoint, data))
+    
+    payload = (endpoint, tuple(sorted((k, str(v)) for k, v in data.items())))
+    if endpoint in PREFETCH_ENDPOINTS:
+        prefetched = prefetch_cache.get(payload)
+        if prefetched is not None:
+            sydia_cache_hits.inc(endpoint=endpoint, source="prefetch")
+            return prefetched
+    
+    key = (asyncio.get_running_loop(), *payload)
+    task = _sydia_inflight.get(key)
+    coalesced = task is not None
+    if task is None:
+        # Appel partagé : chaque appelant compte sa propre attente ci-dessous
+        task = asyncio.ensure_future(_untimed(_sydia_post(endpoint, data)))
+        _sydia_inflight[key] = task
+        task.add_done_callback(lambda t: _sydia_inflight_done(key, t))
+    else:
+        sydia_coalesced += 1
+        sydia_cache_hits.inc(endpoint=endpoint, source="coalesced")
+    
+    # shield : l'annulation d'un appelant n'annule pas la requête partagée ;
+    # chaque appelant a son span et son chronométrage (attente de l'appel partagé)
+    start = time.perf_counter()
+    with span("sydia_call", endpoint=endpoint, coalesced=coalesced) as current:
+        try:
+            response = await asyncio.shield(task)
+        finally:
+            record_timing("sydia", time.perf_counter() - start)
+        current.set(status=response.get("status"))
+    if _prefetching.get() and endpoint in PREFETCH_ENDPOINTS and response.get("status") == 200:
+        prefetch_cache.set(payload, response)
+    return response
+
+
+class TTLCache:
+    """Cache LRU borné dont les entrées expirent après `ttl` secondes"""
+    
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[1] if item else None
+    
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._data)
+    
+    def values(self) -> list:
+        with self._lock:
+            return [value for _, value in self._data.values()]
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+# Réponses préchargées après identification, clé : (endpoint, payload)
+PREFETCH_ENDPOINTS = {"ged/list", "sinistre/checklist/get"}
+prefetch_cache = TTLCache(maxsize=PREFETCH_CACHE_SIZE, ttl=PREFETCH_TTL)
+_prefetching = contextvars.ContextVar("prefetching", default=False)
+_session_id = contextvars.ContextVar("session_id", default=None)  # conversation en cours (voir chat)
+
+
+class Prefetcher:
+    """
+    Préchargement spéculatif des données d'un sinistre identifié
+    
+    list_documents et get_checklist (données propres au sinistre) sont
+    appelés en tâche de fond (au plus PREFETCH_CONCURRENCY à la fois) ; leurs
+    réponses vont dans prefetch_cache et servent les appels d'outils suivants.
+    Quand une conversation passe à un autre sinistre, le préchargement du
+    précédent est annulé.
+    """
+    
+    def __init__(self, concurrency: int, max_pending: int, max_sessions: int):
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.scheduled = 0
+        self.skipped = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = {}  # id_sinistre → tâches en cours
+        self._sessions = OrderedDict()  # session_id → dernier sinistre identifié
+    
+    def pending(self) -> int:
+        return sum(len(tasks) for tasks in self._tasks.values())
+    
+    def schedule(self, id_sinistre: int, session_id: str = None):
+        if session_id is not None:
+            self._switch(session_id, id_sinistre)
+        if not id_sinistre or self._tasks.get(id_sinistre):
+            return
+        if self.pending() >= self.max_pending:
+            self.skipped += 1
+            return
+        
+        tasks = set()
+        for factory in (
+            lambda: list_documents(id_sinistre),
+            lambda: get_checklist(id_sinistre),
+        ):
+            task = asyncio.ensure_future(self._run(factory))
+            tasks.add(task)
+            task.add_done_callback(lambda t: self._done(id_sinistre, t))
+        self._tasks[id_sinistre] = tasks
+        self.scheduled += 1
+    
+    async def _run(self, factory):
+        async with self._semaphore:
+            _prefetching.set(True)  # contexte propre à la tâche
+            _server_timing.set(None)  # pas imputé à la requête qui l'a déclenché,
+            _current_span.set(None)  # ni rattaché à sa trace (déjà terminée le plus souvent)
+            try:
+                await factory()
+            except Exception as e:
+                log.warning("Préchargement échoué: %s", e)
+    
+    def _switch(self, session_id: str, id_sinistre: int):
+        """Annule le préchargement du sinistre précédent de la conversation"""
+        previous = self._sessions.pop(session_id, None)
+        self._sessions[session_id] = id_sinistre
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        if previous and previous != id_sinistre and previous not in self._sessions.values():
+            self.cancel(previous)
+    
+    def _done(self, id_sinistre, task):
+        tasks = self._tasks.get(id_sinistre)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._tasks[id_sinistre]
+    
+    def cancel(self, id_sinistre: int = None):
+        """Annule les préchargements d'un sinistre (ou tous)"""
+        ids = [id_sinistre] if id_sinistre else list(self._tasks)
+        for id_ in ids:
+            for task in self._tasks.pop(id_, ()):
+                task.cancel()
+    
+    def stats(self) -> dict:
+        return {"pending": self.pending(), "scheduled": self.scheduled, "skipped": self.skipped}
+
+
+prefetcher = Prefetcher(PREFETCH_CONCURRENCY, PREFETCH_MAX_PENDING, CONVERSATION_MAX_SESSIONS)
+
+
+def invalidate_prefetch(id_sinistre):
+    """Oublie les réponses préchargées d'un sinistre"""
+    prefetcher.cancel(id_sinistre)
+    for key in prefetch_cache.keys():
+        if ("id_sinistre", str(id_sinistre)) in key[1]:
+            prefetch_cache.pop(key)
+
+
+# Clés : ("id", "221003") et ("ref", "E0025151284") → même dict sinistre
+sinistre_cache = TTLCache(maxsize=SINISTRE_CACHE_SIZE, ttl=SINISTRE_CACHE_TTL)
+
+
+def _sinistre_cache_keys(s: dict, ref_sinistre: str = None) -> set:
+    """Toutes les clés de cache d'un sinistre (id + références connues)"""
+    keys = set()
+    if s.get("id"):
+        keys.add(("id", str(s["id"])))
+    for ref in (ref_sinistre, s.get("ref_assureur"), s.get("ref_courtier")):
+        if ref:
+            keys.add(("ref", ref))
+    return keys
+
+
+class SinistreMirror:
+    """
+    Miroir SQLite (WAL) des données sinistre/list et sinistre/get
+    
+    Les lignes de sinistre/list ne sont réécrites que si elles ont changé
+    (contenu ou position dans la liste) ; les fiches complètes (sinistre/get)
+    sont stockées à la lecture. Une écriture de l'agent ne met à jour que la
+    ligne concernée (set_statut, add_list_row, expire_details) ; une
+    synchronisation en cours ne l'écrase pas avec une page lue avant.
+    
+    Appels SQLite bloquants : depuis la boucle, passer par asyncio.to_thread.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.generation = 0  # incrémenté à chaque écriture de l'agent
+        self._patched = {}  # id_sinistre → génération de la dernière écriture
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS sinistres (
+                    id INTEGER PRIMARY KEY,
+                    id_assure INTEGER,
+                    statut INTEGER,
+                    list_pos INTEGER,
+                    list_json TEXT,
+                    list_hash TEXT,
+                    detail_json TEXT,
+                    detail_synced_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_sinistres_assure ON sinistres(id_assure);
+                CREATE TABLE IF NOT EXISTS refs (
+                    ref TEXT PRIMARY KEY,
+                    id INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    key TEXT PRIMARY KEY,
+                    value REAL
+                );
+            """)
+            columns = {r["name"] for r in self._db.execute("PRAGMA table_info(sinistres)")}
+            if "list_pos" not in columns:  # miroir créé par une version précédente
+                self._db.execute("ALTER TABLE sinistres ADD COLUMN list_pos INTEGER")
+            row = self._db.execute("SELECT value FROM sync_state WHERE key = 'list_synced_at'").fetchone()
+            self.list_synced_at = row["value"] if row else None
+    
+    @staticmethod
+    def _refs(s: dict, ref_sinistre: str = None) -> set:
+        return {r for r in (ref_sinistre, s.get("ref_assureur"), s.get("ref_courtier")) if r}
+    
+    def upsert_list(self, rows: list, start: int = 0, generation: int = None) -> int:
+        """
+        Enregistre une page de sinistre/list, renvoie le nombre de lignes modifiées
+        
+        start : position de la page dans la liste Sydia (ordre conservé par list_page)
+        generation : début de la synchronisation ; les lignes écrites par
+        l'agent depuis sont gardées telles quelles
+        """
+        changed = 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for position, s in enumerate(rows, start):
+                    if not s.get("id"):
+                        continue
+                    if generation is not None and self._patched.get(s["id"], -1) > generation:
+                        continue
+                    raw = json.dumps(s, sort_keys=True)
+                    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+                    cur = self._db.execute(
+                        """INSERT INTO sinistres (id, statut, list_pos, list_json, list_hash) VALUES (?, ?, ?, ?, ?)
+                           ON CONFLICT(id) DO UPDATE SET
+                               statut = excluded.statut,
+                               list_pos = excluded.list_pos,
+                               list_json = excluded.list_json,
+                               list_hash = excluded.list_hash
+                           WHERE list_hash IS NOT excluded.list_hash OR list_pos IS NOT excluded.list_pos""",
+                        (s["id"], s.get("statut"), position, raw, digest)
+                    )
+                    if cur.rowcount:
+                        changed += 1
+                        self._db.executemany(
+                            "INSERT OR REPLACE INTO refs (ref, id) VALUES (?, ?)",
+                            [(r, s["id"]) for r in self._refs(s)]
+                        )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return changed
+    
+    def mark_list_synced(self, seen_ids: set, generation: int) -> int:
+        """
+        Termine une synchronisation complète : supprime les sinistres absents
+        de la liste Sydia (sauf ceux écrits par l'agent depuis le début du
+        parcours, generation) et marque la liste à jour. Renvoie le nombre de
+        sinistres supprimés.
+        """
+        synced_at = time.time()
+        with self._lock:
+            kept = {id_ for id_, g in self._patched.items() if g > generation}
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("CREATE TEMP TABLE IF NOT EXISTS seen_ids (id INTEGER PRIMARY KEY)")
+                self._db.execute("DELETE FROM seen_ids")
+                self._db.executemany("INSERT OR IGNORE INTO seen_ids (id) VALUES (?)",
+                                     [(i,) for i in seen_ids | kept])
+                self._db.execute("DELETE FROM refs WHERE id NOT IN (SELECT id FROM seen_ids)")
+                pruned = self._db.execute("DELETE FROM sinistres WHERE id NOT IN (SELECT id FROM seen_ids)").rowcount
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('list_synced_at', ?)", (synced_at,)
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._patched = {id_: g for id_, g in self._patched.items() if g > generation}
+            self.list_synced_at = synced_at
+        return pruned
+    
+    def list_age(self) -> float:
+        """Âge (s) de la dernière synchronisation complète de la liste (sans accès disque)"""
+        return time.time() - self.list_synced_at if self.list_synced_at else float("inf")
+    
+    def list_page(self, limit: int = None, offset: int = 0, statut: int = None) -> list:
+        query = "SELECT list_json FROM sinistres WHERE list_json IS NOT NULL"
+        params = []
+        if statut is not None:
+            query += " AND statut = ?"
+            params.append(int(statut))
+        query += " ORDER BY list_pos, id LIMIT ? OFFSET ?"
+        params += [limit if limit is not None else -1, offset or 0]
+        with self._lock:
+            return [json.loads(r["list_json"]) for r in self._db.execute(query, params)]
+    
+    def counts(self) -> dict:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) AS total, COALESCE(SUM(statut = 1), 0) AS ouverts "
+                "FROM sinistres WHERE list_json IS NOT NULL"
+            ).fetchone()
+        return {"total": row["total"], "open": row["ouverts"], "closed": row["total"] - row["ouverts"]}
+    
+    def store_detail(self, s: dict, ref_sinistre: str = None):
+        """Enregistre une fiche complète (réponse de sinistre/get)"""
+        if not s.get("id"):
+            return
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO sinistres (id, id_assure, statut, detail_json, detail_synced_at) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET
+                       id_assure = excluded.id_assure,
+                       statut = excluded.statut,
+                       detail_json = excluded.detail_json,
+                       detail_synced_at = excluded.detail_synced_at""",
+                (s["id"], (s.get("assure") or {}).get("id"), s.get("statut"), json.dumps(s), time.time())
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO refs (ref, id) VALUES (?, ?)",
+                [(r, s["id"]) for r in self._refs(s, ref_sinistre)]
+            )
+    
+    def _id_for(self, id_sinistre: int = None, ref_sinistre: str = None):
+        if id_sinistre:
+            return int(id_sinistre)
+        row = self._db.execute("SELECT id FROM refs WHERE ref = ?", (ref_sinistre,)).fetchone()
+        return row["id"] if row else None
+    
+    def get_detail(self, id_sinistre: int = None, ref_sinistre: str = None, max_age: float = SYDIA_MIRROR_MAX_AGE):
+        """Fiche complète si elle a moins de max_age secondes, sinon None"""
+        with self._lock:
+            id_ = self._id_for(id_sinistre, ref_sinistre)
+            if id_ is None:
+                return None
+            row = self._db.execute(
+                "SELECT detail_json, detail_synced_at FROM sinistres WHERE id = ?", (id_,)
+            ).fetchone()
+        if not row or not row["detail_synced_at"] or time.time() - row["detail_synced_at"] > max_age:
+            return None
+        return json.loads(row["detail_json"])
+    
+    def resolve(self, ref_sinistre: str):
+        """(id_sinistre, id_assure) d'une référence connue, sinon None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT s.id, s.id_assure FROM refs r JOIN sinistres s ON s.id = r.id WHERE r.ref = ?",
+                (ref_sinistre,)
+            ).fetchone()
+        return (row["id"], row["id_assure"]) if row else None
+    
+    def _patch(self, id_sinistre: int):
+        self.generation += 1
+        self._patched[int(id_sinistre)] = self.generation
+    
+    def set_statut(self, id_sinistre: int, statut: int):
+        """Après une clôture : statut de la ligne mis à jour, fiche complète périmée"""
+        with self._lock:
+            self._patch(id_sinistre)
+            self._db.execute(
+                """UPDATE sinistres SET statut = ?, detail_synced_at = NULL,
+                       list_json = CASE WHEN list_json IS NULL THEN NULL ELSE json_set(list_json, '$.statut', ?) END
+                   WHERE id = ?""",
+                (statut, statut, int(id_sinistre))
+            )
+    
+    def add_list_row(self, s: dict):
+        """Après une déclaration : nouveau sinistre en tête de liste (ordre de Sydia)"""
+        if not s.get("id"):
+            return
+        with self._lock:
+            self._patch(s["id"])
+            self._db.execute(
+                """INSERT INTO sinistres (id, statut, list_pos, list_json)
+                   VALUES (?, ?, (SELECT COALESCE(MIN(list_pos), 0) - 1 FROM sinistres), ?)
+                   ON CONFLICT(id) DO UPDATE SET statut = excluded.statut, list_json = excluded.list_json""",
+                (s["id"], s.get("statut"), json.dumps(s, sort_keys=True))
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO refs (ref, id) VALUES (?, ?)",
+                [(r, s["id"]) for r in self._refs(s)]
+            )
+    
+    def expire_details(self, id_assure: int):
+        """Après une modification de l'assuré : ses fiches complètes sont périmées"""
+        with self._lock:
+            self._db.execute("UPDATE sinistres SET detail_synced_at = NULL WHERE id_assure = ?", (int(id_assure),))
+
+
+sinistre_mirror = SinistreMirror(SYDIA_MIRROR_PATH) if SYDIA_MIRROR_PATH else None
+
+
+class SinistreIndex:
+    """
+    Index compact ref → (id_sinistre, id_assure, statut), borné en LRU
+    
+    Alimenté par chaque réponse de sinistre/get et sinistre/list. Le statut
+    n'est rendu que pendant `statut_ttl` secondes après son observation, et
+    il est oublié après une écriture (voir invalidate_sinistre).
+    """
+    
+    def __init__(self, maxsize: int, statut_ttl: float):
+        self.maxsize = maxsize
+        self.statut_ttl = statut_ttl
+        self.hits = 0
+        self.misses = 0
+        self._by_ref = OrderedDict()  # ref → (id_sinistre, id_assure, statut, vu à)
+        self._refs_by_id = {}
+        self._ids_by_assure = {}
+        self._lock = threading.Lock()
+    
+    def add(self, s: dict, ref_sinistre: str = None, trust_statut: bool = True):
+        """trust_statut=False : statut d'une source pas assez fraîche (miroir), non retenu"""
+        id_sinistre = s.get("id")
+        if not id_sinistre:
+            return
+        id_assure = (s.get("assure") or {}).get("id") or s.get("id_assure")
+        refs = {r for r in (ref_sinistre, s.get("ref_assureur"), s.get("ref_courtier")) if r}
+        statut = s.get("statut") if trust_statut else None
+        seen_at = time.monotonic() if statut is not None else None
+        
+        with self._lock:
+            for ref in refs:
+                previous = self._by_ref.get(ref)
+                if not id_assure and previous and previous[0] == id_sinistre:
+                    id_assure = previous[1]  # les lignes de sinistre/list n'ont pas l'assuré
+                elif previous and previous[0] != id_sinistre:
+                    self._refs_by_id.get(str(previous[0]), set()).discard(ref)
+                self._by_ref[ref] = (id_sinistre, id_assure, statut, seen_at)
+                self._by_ref.move_to_end(ref)
+                self._refs_by_id.setdefault(str(id_sinistre), set()).add(ref)
+            if id_assure:
+                self._ids_by_assure.setdefault(str(id_assure), set()).add(str(id_sinistre))
+            while len(self._by_ref) > self.maxsize:
+                ref, (old_id, old_assure, _, _) = self._by_ref.popitem(last=False)
+                refs_left = self._refs_by_id.get(str(old_id), set())
+                refs_left.discard(ref)
+                if not refs_left:
+                    self._refs_by_id.pop(str(old_id), None)
+                    ids = self._ids_by_assure.get(str(old_assure), set())
+                    ids.discard(str(old_id))
+                    if not ids:
+                        self._ids_by_assure.pop(str(old_assure), None)
+    
+    def get(self, ref_sinistre: str):
+        with self._lock:
+            entry = self._by_ref.get(ref_sinistre)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._by_ref.move_to_end(ref_sinistre)
+            self.hits += 1
+        id_sinistre, id_assure, statut, seen_at = entry
+        if seen_at is None or time.monotonic() - seen_at > self.statut_ttl:
+            statut = None
+        return id_sinistre, id_assure, statut
+    
+    def refs(self, id_sinistre) -> set:
+        with self._lock:
+            return set(self._refs_by_id.get(str(id_sinistre), ()))
+    
+    def forget_statut(self, id_sinistre: int = None, id_assure: int = None):
+        with self._lock:
+            ids = set(self._ids_by_assure.get(str(id_assure), ())) if id_assure else set()
+            if id_sinistre:
+                ids.add(str(id_sinistre))
+            for id_ in ids:
+                for ref in self._refs_by_id.get(id_, ()):
+                    entry = self._by_ref.get(ref)
+                    if entry is not None:
+                        self._by_ref[ref] = (entry[0], entry[1], None, None)
+    
+    def clear(self):
+        with self._lock:
+            self._by_ref.clear()
+            self._refs_by_id.clear()
+            self._ids_by_assure.clear()
+    
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._by_ref),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+sinistre_index = SinistreIndex(SINISTRE_INDEX_SIZE, statut_ttl=SINISTRE_CACHE_TTL)
+
+
+class DocumentSpool:
+    """Fichier temporaire d'un PDF en cours de réception (hash calculé au fil de l'eau)"""
+    
+    def __init__(self, directory: str):
+        self.file = tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+    
+    def write(self, chunk: bytes):
+        self.file.write(chunk)
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+
+
+class Base64Field:
+    """
+    Décode au fil de l'eau un champ base64 d'un objet JSON reçu par morceaux
+    
+    La valeur du champ est décodée vers write sans être gardée en mémoire ; le
+    reste de l'objet (petit) est accumulé dans rest, où le champ vaut "".
+    """
+    
+    def __init__(self, name: str, write):
+        self.key = json.dumps(name).encode()
+        self.write = write
+        self.rest = bytearray()
+        self.invalid = False
+        self._depth = 0
+        self._string = None  # début de la chaîne en cours dans rest
+        self._escape = False
+        self._last = None  # dernière chaîne fermée (clé possible)
+        self._value = False  # clé du champ vue, valeur attendue
+        self._streaming = False
+        self._pending = b""  # base64 pas encore décodé (< 4 caractères)
+    
+    def feed(self, data: bytes):
+        i = 0
+        while i < len(data):
+            if self._streaming:
+                i = self._feed_value(data, i)
+                continue
+            c = data[i:i + 1]
+            i += 1
+            self.rest += c
+            if self._string is not None:
+                if self._escape:
+                    self._escape = False
+                elif c == b"\\":
+                    self._escape = True
+                elif c == b'"':
+                    self._last = bytes(self.rest[self._string:])
+                    self._string = None
+                continue
+            if c in b" \t\r\n":
+                continue
+            if self._value:
+                self._value = False
+                if c == b'"':
+                    self._streaming = True
+                    continue
+            if c == b'"':
+                self._string = len(self.rest) - 1
+                continue
+            if c == b":" and self._depth == 1 and self._last == self.key:
+                self._value = True
+            elif c in b"{[":
+                self._depth += 1
+            elif c in b"}]":
+                self._depth -= 1
+            self._last = None
+    
+    def _feed_value(self, data: bytes, i: int) -> int:
+        end = data.find(b'"', i)  # pas de guillemet échappé dans du base64
+        self._decode(data[i:len(data) if end < 0 else end], last=end >= 0)
+        if end < 0:
+            return len(data)
+        self._streaming = False
+        self.rest += b'"'
+        return end + 1
+    
+    def _decode(self, text: bytes, last: bool):
+        if self.invalid:
+            return
+        text = self._pending + text
+        carry = b""
+        if text.endswith(b"\\") and not last:
+            text, carry = text[:-1], b"\\"  # échappement coupé entre deux morceaux
+        text = text.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+        cut = len(text) if last else len(text) - len(text) % 4
+        self._pending = text[cut:] + carry
+        try:
+            self.write(base64.b64decode(text[:cut], validate=True))
+        except ValueError:
+            self.invalid = True
+
+
+class DocumentCache:
+    """
+    Cache disque des PDF générés, adressé par contenu
+    
+    <sha256>.pdf : le contenu ; <clé>.json : clé → sha256, nom, taille.
+    Clé : (id_type, id_sinistre, id_assure, id_contrat). Une clé expire après
+    max_age secondes ; au-delà de max_bytes, les PDF les moins récemment
+    servis sont supprimés.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, max_age: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None  # nom de clé → métadonnées, chargé au premier accès
+    
+    @staticmethod
+    def key(id_type, id_sinistre=None, id_assure=None, id_contrat=None) -> str:
+        parts = [str(v) if v else "" for v in (id_type, id_sinistre, id_assure, id_contrat)]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+    
+    def _load(self) -> dict:
+        if self._index is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._index = {}
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    try:
+                        with open(os.path.join(self.directory, name)) as f:
+                            self._index[name[:-5]] = json.load(f)
+                    except (OSError, ValueError):
+                        pass
+        return self._index
+    
+    def path(self, sha256: str):
+        """Chemin du PDF si présent (sha256 validé : pas de traversée de répertoire)"""
+        if not re.fullmatch(r"[0-9a-f]{64}", sha256 or ""):
+            return None
+        path = os.path.join(self.directory, f"{sha256}.pdf")
+        return path if os.path.exists(path) else None
+    
+    def get(self, key: str):
+        with self._lock:
+            meta = self._load().get(key)
+            path = meta and self.path(meta["sha256"])
+            if path is None or time.time() - meta.get("created_at", 0) > self.max_age:
+                if meta:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            os.utime(path)  # LRU sur la date de modification
+            self.hits += 1
+            return meta
+    
+    def spool(self) -> DocumentSpool:
+        os.makedirs(self.directory, exist_ok=True)
+        return DocumentSpool(self.directory)
+    
+    def discard(self, spool: DocumentSpool):
+        spool.file.close()
+        with contextlib.suppress(OSError):
+            os.unlink(spool.file.name)
+    
+    def commit(self, key: str, spool: DocumentSpool, filename: str, id_sinistre=None, id_assure=None) -> dict:
+        """Range le fichier reçu sous son sha256 (dédupliqué) et enregistre la clé"""
+        spool.file.close()
+        sha256 = spool.sha256.hexdigest()
+        meta = {"sha256": sha256, "filename": filename, "size": spool.size,
+                "id_sinistre": str(id_sinistre) if id_sinistre else None,
+                "id_assure": str(id_assure) if id_assure else None,
+                "created_at": time.time()}
+        
+        with self._lock:
+            target = os.path.join(self.directory, f"{sha256}.pdf")
+            if os.path.exists(target):
+                os.unlink(spool.file.name)
+                os.utime(target)
+            else:
+                os.replace(spool.file.name, target)
+            
+            meta_path = os.path.join(self.directory, f"{key}.json")
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(meta_path + ".tmp", meta_path)
+            self._load()[key] = meta
+            self._evict()
+        return meta
+    
+    def _drop(self, key: str):
+        self._load().pop(key, None)
+        with contextlib.suppress(OSError):
+            os.unlink(os.path.join(self.directory, f"{key}.json"))
+    
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pdf"):
+                with contextlib.suppress(OSError):
+                    st = os.stat(os.path.join(self.directory, name))
+                    files.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(OSError):
+                os.unlink(os.path.join(self.directory, name))
+            total -= size
+            for key in [k for k, m in self._index.items() if m["sha256"] == name[:-4]]:
+                self._drop(key)
+    
+    def invalidate(self, id_sinistre=None, id_assure=None):
+        """Oublie les documents générés pour un sinistre ou un assuré (le contenu part à l'éviction)"""
+        targets = {("id_sinistre", str(id_sinistre)) if id_sinistre else None,
+                   ("id_assure", str(id_assure)) if id_assure else None} - {None}
+        with self._lock:
+            for key in [k for k, m in self._load().items()
+                        if any(m.get(field) == value for field, value in targets)]:
+                self._drop(key)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load()
+            blobs = {m["sha256"]: m["size"] for m in index.values()}
+            total = self.hits + self.misses
+            return {
+                "documents": len(index),
+                "files": len(blobs),
+                "bytes": sum(blobs.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0
+            }
+
+
+document_cache = DocumentCache(DOCUMENT_CACHE_DIR, DOCUMENT_CACHE_MAX_BYTES, DOCUMENT_CACHE_MAX_AGE)
+
+
+def mirror_list_fresh() -> bool:
+    return sinistre_mirror is not None and sinistre_mirror.list_age() < SYDIA_MIRROR_MAX_AGE
+
+
+async def sync_mirror() -> dict:
+    """Synchronise la liste des sinistres dans le miroir (lignes modifiées uniquement)"""
+    generation = sinistre_mirror.generation
+    seen_ids = set()
+    seen = changed = 0
+    async for page in iter_sinistres(use_mirror=False):
+        changed += await asyncio.to_thread(sinistre_mirror.upsert_list, page, seen, generation)
+        seen += len(page)
+        seen_ids.update(s["id"] for s in page if s.get("id"))
+    pruned = await asyncio.to_thread(sinistre_mirror.mark_list_synced, seen_ids, generation)
+    return {"seen": seen, "changed": changed, "pruned": pruned}
+
+
+async def mirror_sync_loop():
+    """Tâche de fond : resynchronise le miroir toutes les SYDIA_MIRROR_SYNC_INTERVAL secondes"""
+    while True:
+        try:
+            result = await sync_mirror()
+            log.info(
+                "Miroir synchronisé: %s sinistres, %s modifiés, %s supprimés",
+                result['seen'], result['changed'], result['pruned']
+            )
+        except Exception as e:
+            log.warning("Synchronisation du miroir échouée: %s", e)
+        await asyncio.sleep(SYDIA_MIRROR_SYNC_INTERVAL)
+
+
+def start_mirror_sync():
+    """Démarre la synchronisation du miroir sur la boucle courante (si activé)"""
+    if sinistre_mirror is None:
+        return None
+    return asyncio.ensure_future(mirror_sync_loop())
+
+
+def invalidate_sinistre(id_sinistre: int = None, ref_sinistre: str = None, id_assure: int = None):
+    """Retire un sinistre du cache (et des préchargements) après une écriture"""
+    sinistre_index.forget_statut(id_sinistre=id_sinistre, id_assure=id_assure)
+    if id_sinistre:
+        invalidate_prefetch(id_sinistre)
+    if id_sinistre or id_assure:
+        document_cache.invalidate(id_sinistre=id_sinistre, id_assure=id_assure)
+    
+    entries = []
+    if id_sinistre:
+        entries.append(sinistre_cache.pop(("id", str(id_sinistre))))
+    if ref_sinistre:
+        entries.append(sinistre_cache.pop(("ref", ref_sinistre)))
+    if id_assure:
+        entries += [s for s in sinistre_cache.values()
+                    if str(s.get("assure", {}).get("id")) == str(id_assure)]
+    
+    for s in entries:
+        if s:
+            for key in _sinistre_cache_keys(s):
+                sinistre_cache.pop(key)
+
+
+async def after_cloture(id_sinistre: int):
+    """
+    Après une clôture réussie : statut mis à jour dans le miroir (la liste
+    reste à jour), statistiques recalculées en tâche de fond
+    """
+    if sinistre_mirror is not None:
+        await asyncio.to_thread(sinistre_mirror.set_statut, id_sinistre, 0)
+    stats_cache.invalidate()
+
+
+async def after_new_sinistre(id_sinistre: int):
+    """
+    Après une déclaration réussie : la fiche Sydia est ajoutée en tête de la
+    liste du miroir, statistiques recalculées en tâche de fond
+    """
+    if sinistre_mirror is not None and id_sinistre:
+        result = await get_sinistre(id_sinistre=id_sinistre, use_cache=False)
+        if result["success"] and result["data"]:
+            await asyncio.to_thread(sinistre_mirror.add_list_row, result["data"])
+    stats_cache.invalidate()
+
+
+async def get_sinistre(
+    id_sinistre: int = None,
+    ref_sinistre: str = None,
+    use_cache: bool = True,
+    use_mirror: bool = True
+) -> dict:
+    """Récupère un sinistre (cache TTL, puis miroir local, puis Sydia)"""
+    key = None
+    if id_sinistre:
+        key = ("id", str(id_sinistre))
+    elif ref_sinistre:
+        key = ("ref", ref_sinistre)
+    
+    if use_cache and key:
+        cached = sinistre_cache.get(key)
+        if cached is not None:
+            return {"success": True, "data": cached}
+        
+        if use_mirror and sinistre_mirror is not None:
+            s = await asyncio.to_thread(sinistre_mirror.get_detail, id_sinistre, ref_sinistre)
+            if s:
+                for k in _sinistre_cache_keys(s, ref_sinistre):
+                    sinistre_cache.set(k, s)
+                sinistre_index.add(s, ref_sinistre, trust_statut=False)
+                return {"success": True, "data": s}
+    
     data = {}
     if id_sinistre:
         data["id_sinistre"] = str(id_sinistre)
@@ -131,19 +1875,179 @@ async def get_sinistre(id_sinistre: int = None, ref_sinistre: str = None) -> dic
     response = await sydia_call("sinistre/get", data)
     
     if response.get("status") == 200:
-        return {"success": True, "data": response.get("data", {})}
+        s = response.get("data", {})
+        if s:
+            for k in _sinistre_cache_keys(s, ref_sinistre):
+                sinistre_cache.set(k, s)
+            sinistre_index.add(s, ref_sinistre)
+            if sinistre_mirror is not None:
+                await asyncio.to_thread(sinistre_mirror.store_detail, s, ref_sinistre)
+        return {"success": True, "data": s}
     return {"success": False, "error": response.get("message", "Erreur")}
 
 
-async def list_sinistres() -> dict:
-    """Liste les sinistres"""
-    response = await sydia_call("sinistre/list")
+def _sydia_total(response: dict):
+    """Total renvoyé par Sydia avec une liste paginée, s'il existe"""
+    for source in (response, response.get("data") if isinstance(response.get("data"), dict) else {}):
+        for key in ("total", "count"):
+            if isinstance(source.get(key), int):
+                return source[key]
+    return None
+
+
+async def resolve_sinistre(ref_sinistre: str, need_assure: bool = False, need_statut: bool = False) -> dict:
+    """
+    Résout une référence en id_sinistre / id_assure / statut
+    
+    Index ref ↔ id, puis miroir local, et en dernier recours sinistre/get.
+    Un statut demandé (garde avant écriture) n'a jamais plus de
+    SINISTRE_CACHE_TTL secondes : le miroir n'est pas consulté pour lui.
+    """
+    entry = sinistre_index.get(ref_sinistre)
+    if entry is None and sinistre_mirror is not None:
+        found = await asyncio.to_thread(sinistre_mirror.resolve, ref_sinistre)
+        if found:
+            # Le statut du miroir n'est pas assez frais pour garder une écriture
+            entry = (found[0], found[1], None)
+    
+    if entry and (entry[1] or not need_assure) and (entry[2] is not None or not need_statut):
+        return {"success": True, "id_sinistre": entry[0], "id_assure": entry[1], "statut": entry[2]}
+    
+    result = await get_sinistre(ref_sinistre=ref_sinistre, use_mirror=not need_statut)
+    if not result["success"]:
+        return result
+    s = result["data"]
+    return {
+        "success": True,
+        "id_sinistre": s.get("id"),
+        "id_assure": (s.get("assure") or {}).get("id"),
+        "statut": s.get("statut")
+    }
+
+
+# Sydia respecte-t-il limit/offset sur sinistre/list ? (None : pas encore observé)
+sydia_paginates = None
+
+
+async def list_sinistres(limit: int = None, offset: int = 0, use_mirror: bool = True, **filtres) -> dict:
+    """
+    Liste les sinistres (miroir local s'il est à jour, sinon limit/offset transmis à Sydia)
+    
+    Si Sydia ignore la pagination, la page est découpée ici et la liste
+    complète est renvoyée dans "full" (None sinon) pour éviter de la
+    retélécharger page après page.
+    """
+    global sydia_paginates
+    if use_mirror and set(filtres) <= {"statut"} and mirror_list_fresh():
+        return {
+            "success": True,
+            "data": await asyncio.to_thread(sinistre_mirror.list_page, limit, offset, filtres.get("statut")),
+            "total": None,
+            "full": None
+        }
+    
+    data = {}
+    # Pagination ignorée : requête sans limit/offset, identique pour tous (fusionnée)
+    if limit is not None and sydia_paginates is not False:
+        data["limit"] = str(limit)
+        if offset:
+            data["offset"] = str(offset)
+    for key, value in filtres.items():
+        if value is not None:
+            data[key] = str(value)
+    
+    response = await sydia_call("sinistre/list", data)
     
     if response.get("status") == 200:
-        return {"success": True, "data": response.get("data", [])}
+        sinistres = response.get("data", [])
+        if isinstance(sinistres, dict):
+            sinistres = sinistres.get("sinistres", [])
+        full = None
+        if limit is not None and (sydia_paginates is False or len(sinistres) > limit):
+            sydia_paginates = False
+            full, sinistres = sinistres, sinistres[offset:offset + limit]
+        for s in full if full is not None else sinistres:
+            sinistre_index.add(s)
+        total = _sydia_total(response)
+        if total is None and full is not None:
+            total = len(full)
+        return {"success": True, "data": sinistres, "total": total, "full": full}
     return {"success": False, "error": response.get("message", "Erreur")}
 
 
+async def iter_sinistres(page_size: int = SINISTRES_PAGE_SIZE, use_mirror: bool = True, **filtres):
+    """Parcourt tous les sinistres page par page (générateur de listes)"""
+    global sydia_paginates
+    offset = 0
+    first_id = None
+    while True:
+        result = await list_sinistres(limit=page_size, offset=offset, use_mirror=use_mirror, **filtres)
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+        
+        # Sydia a renvoyé toute la liste : on la découpe sans la redemander
+        if result.get("full") is not None:
+            full = result["full"]
+            for start in range(offset, len(full), page_size):
+                yield full[start:start + page_size]
+            return
+        
+        page = result["data"]
+        if not page:
+            return
+        # Page identique à la première : Sydia ignore offset, on redemande la
+        # liste complète (sans limit/offset) et on la découpe ci-dessus
+        if offset and page[0].get("id") == first_id:
+            sydia_paginates = False
+            continue
+        first_id = page[0].get("id")
+        
+        yield page
+        
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+
+async def count_sinistres() -> dict:
+    """
+    Compte les sinistres (total / ouverts / clôturés)
+    
+    Chemin rapide si Sydia renvoie un total avec une page d'un élément,
+    comptage direct si Sydia renvoie toute la liste en ignorant limit,
+    sinon parcours page par page sans garder la liste en mémoire.
+    Avec un miroir local à jour, le comptage est fait en SQL.
+    """
+    if mirror_list_fresh():
+        return {"success": True, **await asyncio.to_thread(sinistre_mirror.counts)}
+    
+    total_result = await list_sinistres(limit=1)
+    if not total_result["success"]:
+        return total_result
+    
+    full = total_result.get("full")
+    open_result = {}
+    if full is None and total_result["total"] is not None:
+        open_result = await list_sinistres(limit=1, statut=1)
+    filtre_respecte = all(s.get("statut") == 1 for s in open_result.get("data", []))
+    
+    if full is not None:
+        total = len(full)
+        ouverts = sum(1 for s in full if s.get("statut") == 1)
+    elif total_result["total"] is not None and open_result.get("total") is not None and filtre_respecte:
+        total, ouverts = total_result["total"], open_result["total"]
+    else:
+        total = ouverts = 0
+        try:
+            async for page in iter_sinistres():
+                total += len(page)
+                ouverts += sum(1 for s in page if s.get("statut") == 1)
+        except RuntimeError as e:
+            return {"success": False, "error": str(e)}
+    
+    return {"success": True, "total": total, "open": ouverts, "closed": total - ouverts}
+
+
 async def add_sinistre(
     type_sinistre: int,
     date_sinistre: str,
@@ -181,10 +2085,12 @@ async def add_sinistre(
     }
     
     response = await sydia_call("sinistre/add", data)
+    invalidate_sinistre(ref_sinistre=ref_sinistre)
     
-    print(f"DEBUG add_sinistre response: {response}")
+    log.debug("add_sinistre response: %s", Payload(response))
     
     if response.get("status") == 200:
+        await after_new_sinistre(response.get("id_sinistre"))
         return {
             "success": True,
             "id_sinistre": response.get("id_sinistre"),
@@ -202,7 +2108,7 @@ async def list_documents(id_sinistre: int) -> dict:
     
     response = await sydia_call("ged/list", data)
     
-    print(f"DEBUG list_documents response: {response}")
+    log.debug("list_documents response: %s", Payload(response))
     
     if response.get("status") == 200:
         data_obj = response.get("data", {})
@@ -222,7 +2128,7 @@ async def get_document(id_ged: int) -> dict:
     
     response = await sydia_call("ged/get", data)
     
-    print(f"DEBUG get_document response: {response}")
+    log.debug("get_document response: %s", Payload(response))
     
     if response.get("status") == 200:
         return {
@@ -241,28 +2147,31 @@ async def add_document(
     id_sinistre: int,
     filename: str,
     commentaire: str = "",
-    content_text: str = ""
+    content_text: str = "",
+    content=None
 ) -> dict:
-    """Ajoute un document à un sinistre"""
-    import base64
+    """
+    Ajoute un document à un sinistre
     
-    if content_text:
-        content_base64 = base64.b64encode(content_text.encode('utf-8')).decode('utf-8')
-    else:
-        content_base64 = base64.b64encode(b"Document vide").decode('utf-8')
+    content : bytes, chemin (os.PathLike), fichier binaire ouvert ou flux
+    asynchrone d'octets (encodé en base64 au fil de l'envoi) ; une chaîne est
+    refusée (TypeError), le texte passe par content_text.
+    """
+    if content is None:
+        content = content_text.encode('utf-8') if content_text else b"Document vide"
     
     data = {
         "id_sinistre": str(id_sinistre),
         "filename": filename,
         "commentaire": commentaire,
-        "content": content_base64,
         "public": "1",
         "notif_gestionnaire": "1",
     }
     
-    response = await sydia_call("ged/add", data)
+    response = await sydia_upload("ged/add", data, content)
+    invalidate_sinistre(id_sinistre=id_sinistre)
     
-    print(f"DEBUG add_document response: {response}")
+    log.debug("add_document response: %s", Payload(response))
     
     if response.get("status") == 200:
         return {
@@ -290,11 +2199,14 @@ async def update_assure(id_assure: int, **kwargs) -> dict:
         if champ in kwargs and kwargs[champ]:
             data[champ] = str(kwargs[champ])
     
-    print(f"DEBUG update_assure data: {data}")
+    log.debug("update_assure data: %s", Payload(data))
     
     response = await sydia_call("assure/update", data)
+    invalidate_sinistre(id_assure=id_assure)
+    if sinistre_mirror is not None:
+        await asyncio.to_thread(sinistre_mirror.expire_details, id_assure)
     
-    print(f"DEBUG update_assure response: {response}")
+    log.debug("update_assure response: %s", Payload(response))
     
     if response.get("status") == 200 or response.get("id_assure"):
         return {
@@ -324,11 +2236,12 @@ async def contact_gestionnaire(
     if type_demande == 1 and rappel_preference:
         data["rappel_preference"] = rappel_preference
     
-    print(f"DEBUG contact_gestionnaire data: {data}")
+    log.debug("contact_gestionnaire data: %s", Payload(data))
     
     response = await sydia_call("sinistre/contact", data)
+    invalidate_sinistre(id_sinistre=id_sinistre)
     
-    print(f"DEBUG contact_gestionnaire response: {response}")
+    log.debug("contact_gestionnaire response: %s", Payload(response))
     
     if response.get("status") == 200 or response.get("id_tache"):
         return {
@@ -352,13 +2265,15 @@ async def cloturer_sinistre(
         "commentaire": commentaire
     }
     
-    print(f"DEBUG cloturer_sinistre data: {data}")
+    log.debug("cloturer_sinistre data: %s", Payload(data))
     
     response = await sydia_call("sinistre/cloturer", data)
+    invalidate_sinistre(id_sinistre=id_sinistre)
     
-    print(f"DEBUG cloturer_sinistre response: {response}")
+    log.debug("cloturer_sinistre response: %s", Payload(response))
     
     if response.get("status") == 200 or response.get("id_sinistre"):
+        await after_cloture(id_sinistre)
         return {
             "success": True,
             "id_sinistre": response.get("id_sinistre") or id_sinistre
@@ -381,11 +2296,11 @@ async def list_reglements(
     if sens is not None:
         data["sens"] = str(sens)
     
-    print(f"DEBUG list_reglements data: {data}")
+    log.debug("list_reglements data: %s", Payload(data))
     
     response = await sydia_call("sinistre/reglement/list", data)
     
-    print(f"DEBUG list_reglements response: {response}")
+    log.debug("list_reglements response: %s", Payload(response))
     
     if response.get("status") == 200:
         return {
@@ -406,11 +2321,11 @@ async def get_checklist(id_sinistre: int) -> dict:
         "id_sinistre": str(id_sinistre)
     }
     
-    print(f"DEBUG get_checklist data: {data}") 
+    log.debug("get_checklist data: %s", Payload(data))
     
     response = await sydia_call("sinistre/checklist/get", data)
     
-    print(f"DEBUG get_checklist response: {response}")
+    log.debug("get_checklist response: %s", Payload(response))
     
     if response.get("status") == 200:
         return {
@@ -431,7 +2346,17 @@ async def generate_document(
     id_assure: int = None,
     id_contrat: int = None
 ) -> dict:
-    """Génère un document PDF (attestation, courrier, etc.)"""
+    """
+    Génère un document PDF (attestation, courrier, etc.)
+    
+    Le PDF est écrit sur disque au fil de la réception (document_cache) ; une
+    nouvelle demande avec les mêmes paramètres est servie sans appel Sydia.
+    """
+    key = DocumentCache.key(id_type, id_sinistre, id_assure, id_contrat)
+    cached = await asyncio.to_thread(document_cache.get, key)
+    if cached:
+        return {"success": True, **cached, "url": f"/api/documents/{cached['sha256']}", "cached": True}
+    
     data = {
         "id_type": str(id_type),
         "token": SYDIA_TOKEN
@@ -444,48 +2369,78 @@ async def generate_document(
     if id_contrat:
         data["id_contrat"] = str(id_contrat)
     
-    print(f"DEBUG generate_document data: {data}")
+    log.debug("generate_document data: %s", Payload(data))
+    
+    async def receive(chunks, spool: DocumentSpool, write):
+        """Passe les morceaux reçus à write (hors de la boucle), spool supprimé sur erreur"""
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(write, chunk)
+        except BaseException:
+            document_cache.discard(spool)
+            raise
+    
+    async def store(spool: DocumentSpool, filename: str) -> dict:
+        meta = await asyncio.to_thread(document_cache.commit, key, spool, filename, id_sinistre, id_assure)
+        return {"success": True, **meta, "url": f"/api/documents/{meta['sha256']}", "cached": False}
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
+        with sydia_timer("ged/document/get") as timer:
+            async with get_sydia_client().stream(
+                "POST",
                 f"{SYDIA_URL}/api/v2/ged/document/get",
                 data=data,
                 headers={"Content-Type": "application/x-www-form-urlencoded"}
-            )
-        
-        print(f"DEBUG generate_document status: {response.status_code}")
-        print(f"DEBUG generate_document content-type: {response.headers.get('content-type')}")
-        
-        # Essayer de parser en JSON
-        try:
-            result = response.json()
-            print(f"DEBUG generate_document response: {result}")
-            
-            if result.get("filename"):
-                return {
-                    "success": True,
-                    "filename": result.get("filename"),
-                    "size": result.get("size"),
-                    "content": result.get("content")
-                }
-            if result.get("status") == 500:
-                return {"success": False, "error": result.get("message", "Erreur")}
-            return {
-                "success": True,
-                "data": result
-            }
-        except:
-            if response.status_code == 200:
+            ) as response:
+                timer["status"] = response.status_code
+                log.debug(
+                    "generate_document status: %s (%s)",
+                    response.status_code, response.headers.get('content-type')
+                )
+                
+                chunks = response.aiter_bytes()
+                first = b""
+                async for first in chunks:
+                    if first:
+                        break
+                
+                async def body():
+                    yield first
+                    async for chunk in chunks:
+                        yield chunk
+                
+                spool = document_cache.spool()
+                if first.lstrip()[:1] != b"{":
+                    # PDF binaire : directement dans le spool
+                    if response.status_code != 200:
+                        document_cache.discard(spool)
+                        return {"success": False, "error": f"Erreur HTTP {response.status_code}"}
+                    await receive(body(), spool, spool.write)
+                    return await store(spool, "document.pdf")
+                
+                # Réponse JSON (erreur, ou PDF en base64 décodé au fil de l'eau dans le spool)
+                field = Base64Field("content", spool.write)
+                await receive(body(), spool, field.feed)
+                try:
+                    result = json.loads(field.rest)
+                except ValueError:
+                    document_cache.discard(spool)
+                    raise
+                log.debug("generate_document response: %s", Payload(result))
+                
+                if result.get("filename") and not field.invalid:
+                    return await store(spool, result.get("filename"))
+                document_cache.discard(spool)
+                if result.get("filename"):
+                    return {"success": False, "error": "Document reçu illisible (base64 invalide)"}
+                if result.get("status") == 500:
+                    return {"success": False, "error": result.get("message", "Erreur")}
                 return {
                     "success": True,
-                    "filename": "document.pdf",
-                    "size": len(response.content),
-                    "content": response.content  # Binary
+                    "data": result
                 }
-            return {"success": False, "error": f"Erreur HTTP {response.status_code}"}
     except Exception as e:
-        print(f"DEBUG generate_document error: {e}")
+        log.warning("generate_document échoué: %s", e)
         return {"success": False, "error": str(e)}
 
 
@@ -546,6 +2501,10 @@ TOOLS = [
                     "limit": {
                         "type": "integer",
                         "description": "Nombre de sinistres (défaut: 10)"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Nombre de sinistres à sauter, pour voir la page suivante (défaut: 0)"
                     }
                 }
             }
@@ -904,6 +2863,58 @@ TOOLS = [
 ]
 
 
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Mots vides : ne désignent pas une pièce ("Photos des dommages" ≠ "devis des travaux")
+_STOPWORDS = frozenset("""
+    aux avec ces dans des du elle est les leur leurs une par pas pour que qui sans ses son sont sur
+    the and for
+""".split())
+
+
+def normalize_text(text: str) -> str:
+    """Texte en minuscules, sans accents"""
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def build_document_index(documents: list) -> tuple:
+    """
+    Index des pièces fournies pour verifier_checklist
+    
+    Retourne (noms de fichiers et catégories normalisés concaténés, mots triés).
+    """
+    texts = []
+    for d in documents:
+        texts.append(normalize_text(d.get("filename", "")))
+        texts.append(normalize_text(d.get("categorie", "")))
+    joined = "\n".join(texts)
+    return joined, sorted(set(_WORD_RE.findall(joined)))
+
+
+def _has_prefix(words: list, prefix: str) -> bool:
+    """Un des mots triés commence-t-il par prefix ?"""
+    i = bisect.bisect_left(words, prefix)
+    return i < len(words) and words[i].startswith(prefix)
+
+
+def piece_fournie(nom: str, index: tuple) -> bool:
+    """
+    Une pièce est fournie si un mot des documents commence par un de ses mots
+    (3 lettres et plus, hors mots vides : "facture" → "factures_2023.pdf"),
+    ou si son nom complet apparaît
+    """
+    joined, words = index
+    nom_norm = normalize_text(nom).strip()
+    if not joined or not nom_norm:
+        return False
+    
+    if any(_has_prefix(words, word) for word in _WORD_RE.findall(nom_norm)
+           if len(word) >= 3 and word not in _STOPWORDS):
+        return True
+    return nom_norm in joined
+
+
 async def execute_tool(name: str, arguments: dict) -> str:
     """Exécute un outil"""
     
@@ -926,6 +2937,9 @@ async def execute_tool(name: str, arguments: dict) -> str:
         assure_prenom = assure.get("prenom", "").strip().upper()
         
         if assure_nom == nom and assure_prenom == prenom:
+            if PREFETCH_ENABLED:
+                prefetcher.schedule(s.get("id"), session_id=_session_id.get())
+            
             # Identification réussie → afficher les infos du dossier
             ref = s.get("ref_assureur") or s.get("ref_courtier") or s.get("id")
             statut = "🟢 OUVERT" if s.get("statut") == 1 else "🔴 CLÔTURÉ"
@@ -1034,12 +3048,13 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
     # =========================================================================
     elif name == "list_sinistres":
         limit = arguments.get("limit", 10)
-        result = await list_sinistres()
+        offset = arguments.get("offset", 0)
+        result = await list_sinistres(limit=limit, offset=offset)
         
         if not result["success"]:
             return f"❌ Erreur: {result['error']}"
         
-        sinistres = result["data"][:limit]
+        sinistres = result["data"]
         
         lines = [f"**LISTE DES SINISTRES ({len(sinistres)} résultats)**", ""]
         
@@ -1222,13 +3237,12 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
     elif name == "contact_gestionnaire":
         ref_sinistre = arguments.get("ref_sinistre")
         
-        sinistre_result = await get_sinistre(ref_sinistre=ref_sinistre)
+        sinistre_result = await resolve_sinistre(ref_sinistre)
         
         if not sinistre_result["success"]:
             return f"❌ Sinistre non trouvé avec la référence {ref_sinistre}"
         
-        s = sinistre_result["data"]
-        id_sinistre = s.get("id")
+        id_sinistre = sinistre_result["id_sinistre"]
         
         if not id_sinistre:
             return f"❌ Impossible de trouver l'ID du sinistre {ref_sinistre}"
@@ -1285,18 +3299,17 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
     elif name == "cloturer_sinistre":
         ref_sinistre = arguments.get("ref_sinistre")
         
-        sinistre_result = await get_sinistre(ref_sinistre=ref_sinistre)
+        sinistre_result = await resolve_sinistre(ref_sinistre, need_statut=True)
         
         if not sinistre_result["success"]:
             return f"❌ Sinistre non trouvé avec la référence {ref_sinistre}"
         
-        s = sinistre_result["data"]
-        id_sinistre = s.get("id")
+        id_sinistre = sinistre_result["id_sinistre"]
         
         if not id_sinistre:
             return f"❌ Impossible de trouver l'ID du sinistre {ref_sinistre}"
         
-        if s.get("statut") != 1:
+        if sinistre_result["statut"] != 1:
             return f"❌ Le sinistre {ref_sinistre} est déjà clôturé."
         
         raison = arguments.get("raison", 25)
@@ -1348,18 +3361,20 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
     elif name == "verifier_checklist":
         ref_sinistre = arguments.get("ref_sinistre")
         
-        sinistre_result = await get_sinistre(ref_sinistre=ref_sinistre)
+        sinistre_result = await resolve_sinistre(ref_sinistre)
         
         if not sinistre_result["success"]:
             return f"❌ Sinistre non trouvé avec la référence {ref_sinistre}"
         
-        s = sinistre_result["data"]
-        id_sinistre = s.get("id")
+        id_sinistre = sinistre_result["id_sinistre"]
         
         if not id_sinistre:
             return f"❌ Impossible de trouver l'ID du sinistre {ref_sinistre}"
         
-        checklist_result = await get_checklist(id_sinistre)
+        checklist_result, docs_result = await asyncio.gather(
+            get_checklist(id_sinistre),
+            list_documents(id_sinistre)
+        )
         
         if not checklist_result["success"]:
             return f"❌ Erreur checklist: {checklist_result['error']}"
@@ -1369,11 +3384,7 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
         if not checklist_requise:
             return f"📋 Aucune checklist configurée pour ce type de sinistre."
         
-        docs_result = await list_documents(id_sinistre)
-        documents_fournis = []
-        if docs_result["success"]:
-            documents_fournis = [d.get("filename", "").upper() for d in docs_result.get("documents", [])]
-            documents_fournis += [d.get("categorie", "").upper() for d in docs_result.get("documents", [])]
+        index = build_document_index(docs_result.get("documents", []) if docs_result["success"] else [])
         
         lines = [f"**📋 CHECKLIST DU SINISTRE {ref_sinistre}**", ""]
         
@@ -1384,14 +3395,7 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
             nom = piece.get("nom", "")
             description = piece.get("description", "")
             
-            nom_upper = nom.upper()
-            found = False
-            for doc in documents_fournis:
-                if nom_upper in doc or any(word in doc for word in nom_upper.split()):
-                    found = True
-                    break
-            
-            if found:
+            if piece_fournie(nom, index):
                 pieces_ok.append(f"✅ **{nom}**")
             else:
                 pieces_manquantes.append(f"❌ **{nom}** - {description}")
@@ -1466,13 +3470,12 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
         ref_sinistre = arguments.get("ref_sinistre")
         id_type = arguments.get("id_type")
         
-        sinistre_result = await get_sinistre(ref_sinistre=ref_sinistre)
+        sinistre_result = await resolve_sinistre(ref_sinistre)
         
         if not sinistre_result["success"]:
             return f"❌ Sinistre non trouvé avec la référence {ref_sinistre}"
         
-        s = sinistre_result["data"]
-        id_sinistre = s.get("id")
+        id_sinistre = sinistre_result["id_sinistre"]
         
         if not id_sinistre:
             return f"❌ Impossible de trouver l'ID du sinistre {ref_sinistre}"
@@ -1499,6 +3502,7 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
 **Fichier:** {result.get('filename')}
 **Taille:** {size_kb:.1f} Ko
 **Sinistre:** {ref_sinistre}
+**Téléchargement:** {result.get('url', 'N/A')}
 
 📄 Le document PDF a été généré.
 🔄 L'interface Sydia va se rafraîchir automatiquement."""
@@ -1511,7 +3515,7 @@ Veuillez vérifier le nom, prénom et la référence du sinistre."""
         
         id_type = TYPES_EVENEMENTS.get(type_evt, 4)
         
-        print(f"DEBUG creer_evenement: type_evt={type_evt}, id_type={id_type}, date={date_evt}, heure={heure_evt}")
+        log.debug("creer_evenement: type_evt=%s id_type=%s date=%s heure=%s", type_evt, id_type, date_evt, heure_evt)
         
         notify_refresh(
             action='open_event_modal',
@@ -1542,35 +3546,33 @@ Le gestionnaire peut vérifier et cliquer sur "Enregistrer l'évènement"."""
     elif name == "preparer_mail":
         ref_sinistre = arguments.get("ref_sinistre")
         type_mail = arguments.get("type_mail", "adversaire_reclamation")
-    
-    id_modele = MODELES_MAIL_SYDIA.get(type_mail, 744)
-    
-    sinistre_result = await get_sinistre(ref_sinistre=ref_sinistre)
-    
-    if not sinistre_result["success"]:
-        return f"❌ Sinistre non trouvé: {ref_sinistre}"
-    
-    s = sinistre_result["data"]
-    id_sinistre = s.get("id")
-    id_assure = s.get("assure", {}).get("id", 0) 
-    
-    notify_refresh(
-        action='open_mail_modal',
-        data={
-            'ref_sinistre': ref_sinistre,
-            'id_modele': id_modele,
-            'id_assure': id_assure,  
-            'type_mail': type_mail
-        },
-        endpoint='mail/prepare',
-        fields={
-            'id_modele': id_modele,
-            'id_assure': id_assure, 
-            'type_mail': type_mail
-        }
-    )
-    
-    return f"""✅ **MODALE MAIL OUVERTE**
+        
+        id_modele = MODELES_MAIL_SYDIA.get(type_mail, 744)
+        
+        sinistre_result = await resolve_sinistre(ref_sinistre, need_assure=True)
+        
+        if not sinistre_result["success"]:
+            return f"❌ Sinistre non trouvé: {ref_sinistre}"
+        
+        id_assure = sinistre_result["id_assure"] or 0
+        
+        notify_refresh(
+            action='open_mail_modal',
+            data={
+                'ref_sinistre': ref_sinistre,
+                'id_modele': id_modele,
+                'id_assure': id_assure,  
+                'type_mail': type_mail
+            },
+            endpoint='mail/prepare',
+            fields={
+                'id_modele': id_modele,
+                'id_assure': id_assure, 
+                'type_mail': type_mail
+            }
+        )
+        
+        return f"""✅ **MODALE MAIL OUVERTE**
 
 **Sinistre:** {ref_sinistre}
 **Modèle:** {type_mail}
@@ -1581,19 +3583,71 @@ Le gestionnaire peut vérifier et cliquer sur "Enregistrer l'évènement"."""
     return f"❌ Outil inconnu: {name}"
 
 
+async def execute_tool_calls(tool_calls: list) -> list:
+    """
+    Exécute les tool_calls d'un tour en parallèle (max TOOL_CONCURRENCY)
+    
+    Les outils de SERIAL_TOOLS s'exécutent seuls, dans l'ordre, comme des barrières.
+    Les résultats sont renvoyés dans l'ordre des tool_calls.
+    """
+    semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+    
+    async def run(tool_call):
+        name = tool_call["function"]["name"]
+        async with semaphore:
+            start = time.perf_counter()
+            outcome = "exception"
+            with span("execute_tool", tool=name) as current:
+                try:
+                    result = await execute_tool(name, json.loads(tool_call["function"]["arguments"] or "{}"))
+                    outcome = "error" if result.startswith("❌") else "ok"
+                    return result
+                finally:
+                    current.set(outcome=outcome)
+                    tool_seconds.observe(time.perf_counter() - start, tool=name, outcome=outcome)
+    
+    start = time.perf_counter()
+    results = []
+    batch = []
+    for tool_call in tool_calls:
+        if tool_call["function"]["name"] in SERIAL_TOOLS:
+            results += await asyncio.gather(*batch)
+            batch = []
+            results.append(await run(tool_call))
+        else:
+            batch.append(run(tool_call))
+    results += await asyncio.gather(*batch)
+    record_timing("tool", time.perf_counter() - start)
+    return results
+
+
 def notify_refresh(action: str, data: dict, endpoint: str = None, fields: dict = None):
     """
     Envoie une notification WebSocket pour rafraîchir l'interface
     
     V2: Envoie le nom de l'endpoint + les champs modifiés pour refresh ciblé
     """
-    socketio.emit('sydia_update', {
-        'action': action,
-        'endpoint': endpoint,
-        'fields': fields or {},
-        'timestamp': __import__('time').time()
-    })
-    print(f"📡 WebSocket V2: {action} | endpoint: {endpoint}")
+    with span("notify_refresh", action=action, endpoint=endpoint):
+        _update_emitter({
+            'action': action,
+            'endpoint': endpoint,
+            'fields': fields or {},
+            'timestamp': __import__('time').time()
+        })
+    log.info("WebSocket V2: %s", action, extra={"endpoint": endpoint})
+
+
+def _emit_flask_socketio(payload: dict):
+    socketio.emit('sydia_update', payload)
+
+
+_update_emitter = _emit_flask_socketio
+
+
+def set_update_emitter(emitter):
+    """Remplace la diffusion 'sydia_update' (utilisé par le mode ASGI)"""
+    global _update_emitter
+    _update_emitter = emitter
 
 
 SYSTEM_PROMPT = """Tu es un assistant Sydia spécialisé dans la gestion des sinistres.
@@ -1696,46 +3750,328 @@ Quand tu utilises creer_evenement, détecte le TYPE automatiquement selon le con
 """
 
 
+def estimate_size(messages: list) -> int:
+    """Taille approximative (octets) d'un historique de messages"""
+    size = 0
+    for m in messages:
+        size += 64 + len(m.get("content") or "")
+        if m.get("tool_calls"):
+            size += len(json.dumps(m["tool_calls"]))
+    return size
+
+
+class ConversationStore:
+    """
+    Historiques de conversation bornés
+    
+    Éviction LRU au-delà de max_sessions ou de max_bytes (taille estimée),
+    et expiration des sessions inactives depuis plus de idle_ttl secondes.
+    """
+    
+    def __init__(self, max_sessions: int, idle_ttl: float, max_bytes: int):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        # session_id → [messages, dernière activité, taille estimée], du moins au plus récent
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, session_id: str) -> list:
+        """Retourne l'historique d'une session (créé si besoin)"""
+        with self._lock:
+            self._expire()
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+                entry = [messages, time.monotonic(), estimate_size(messages)]
+                self._sessions[session_id] = entry
+                self.total_bytes += entry[2]
+                self._evict()
+            else:
+                entry[1] = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return entry[0]
+    
+    def touch(self, session_id: str, messages: list):
+        """
+        Enregistre une session après un tour et recalcule sa taille
+        
+        La session a pu être évincée pendant le tour (autres sessions, TTL) :
+        elle est alors réinsérée pour ne pas perdre le tour.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] is not messages:
+                if entry is not None:
+                    self.total_bytes -= entry[2]
+                entry = [messages, time.monotonic(), 0]
+                self._sessions[session_id] = entry
+            size = estimate_size(entry[0])
+            self.total_bytes += size - entry[2]
+            entry[1] = time.monotonic()
+            entry[2] = size
+            self._sessions.move_to_end(session_id)
+            self._evict()
+    
+    def _drop_oldest(self):
+        _, (_, _, size) = self._sessions.popitem(last=False)
+        self.total_bytes -= size
+        self.evictions += 1
+    
+    def _expire(self):
+        limit = time.monotonic() - self.idle_ttl
+        while self._sessions and next(iter(self._sessions.values()))[1] < limit:
+            self._drop_oldest()
+    
+    def _evict(self):
+        while len(self._sessions) > self.max_sessions:
+            self._drop_oldest()
+        # Garde au moins la session courante même si elle dépasse seule max_bytes
+        while self.total_bytes > self.max_bytes and len(self._sessions) > 1:
+            self._drop_oldest()
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+    
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire()
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self.total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "evictions": self.evictions
+            }
+
+
+conversations = ConversationStore(
+    max_sessions=CONVERSATION_MAX_SESSIONS,
+    idle_ttl=CONVERSATION_IDLE_TTL,
+    max_bytes=CONVERSATION_MAX_BYTES
+)
+
+
+Gauge("conversations_live", "Conversations en mémoire", fn=lambda: len(conversations))
+
+
 def get_messages(session_id: str) -> list:
-    if session_id not in conversations:
-        conversations[session_id] = [{"role": "system", "content": SYSTEM_PROMPT}]
-    return conversations[session_id]
+    return conversations.get(session_id)
+
+
+def estimate_tokens(messages: list) -> int:
+    """Estimation grossière du nombre de tokens (~4 caractères par token)"""
+    return estimate_size(messages) // 4
+
+
+def summarize_tool_message(message: dict) -> dict:
+    """Réduit un ancien résultat d'outil à sa première ligne"""
+    content = message.get("content") or ""
+    if message.get("role") != "tool" or len(content) <= CONTEXT_TOOL_SUMMARY_CHARS:
+        return message
+    
+    lines = content.split("\n")
+    summary = lines[0][:CONTEXT_TOOL_SUMMARY_CHARS]
+    return {**message, "content": f"{summary}\n[… {len(lines) - 1} ligne(s) omise(s), résultat d'un tour précédent]"}
+
+
+def build_context(messages: list) -> tuple:
+    """
+    Prépare les messages envoyés au modèle
+    
+    Le prompt système et les CONTEXT_KEEP_TURNS derniers tours restent intacts.
+    Les résultats d'outils plus anciens sont résumés, puis les tours les plus
+    anciens sont retirés tant que CONTEXT_TOKEN_BUDGET est dépassé.
+    L'historique stocké n'est pas modifié.
+    
+    Retourne (messages à envoyer, tokens économisés).
+    """
+    head = messages[:1] if messages and messages[0].get("role") == "system" else []
+    
+    # Un tour = un message user suivi des réponses assistant/outils
+    turns = []
+    for m in messages[len(head):]:
+        if m.get("role") == "user" or not turns:
+            turns.append([m])
+        else:
+            turns[-1].append(m)
+    
+    keep = max(CONTEXT_KEEP_TURNS, 1)
+    old_turns = [[summarize_tool_message(m) for m in turn] for turn in turns[:-keep]]
+    recent_turns = turns[-keep:]
+    
+    def flatten(groups):
+        return [m for turn in groups for m in turn]
+    
+    recent_tokens = estimate_tokens(head + flatten(recent_turns))
+    old_tokens = [estimate_tokens(turn) for turn in old_turns]
+    while old_turns and recent_tokens + sum(old_tokens) > CONTEXT_TOKEN_BUDGET:
+        old_turns.pop(0)
+        old_tokens.pop(0)
+    
+    context = head + flatten(old_turns) + flatten(recent_turns)
+    return context, max(estimate_tokens(messages) - estimate_tokens(context), 0)
+
+
+def count_llm_tokens(messages: list, message: dict, usage=None):
+    """Compte les tokens d'un appel (usage renvoyé par l'API, sinon estimation)"""
+    if usage is not None:
+        llm_tokens.inc(usage.prompt_tokens, model=MODEL, kind="prompt", source="usage")
+        llm_tokens.inc(usage.completion_tokens, model=MODEL, kind="completion", source="usage")
+    else:
+        llm_tokens.inc(estimate_tokens(messages), model=MODEL, kind="prompt", source="estimate")
+        llm_tokens.inc(estimate_tokens([message]), model=MODEL, kind="completion", source="estimate")
+
+
+async def complete(llm, messages: list, on_delta=None, **kwargs) -> dict:
+    """
+    Appelle le LLM et renvoie le message assistant sous forme de dict
+    
+    Si on_delta est fourni, la réponse est streamée : chaque morceau de texte
+    est passé à on_delta dès réception et les tool_calls sont réassemblés.
+    """
+    start = time.perf_counter()
+    if on_delta is None:
+        response = await llm.chat.completions.create(model=MODEL, messages=messages, **kwargs)
+        llm_request_seconds.observe(time.perf_counter() - start, model=MODEL, mode="sync")
+        record_timing("llm", time.perf_counter() - start)
+        message = response.choices[0].message.model_dump(exclude_none=True)
+        count_llm_tokens(messages, message, response.usage)
+        return message
+    
+    if LLM_STREAM_USAGE:
+        kwargs["stream_options"] = {"include_usage": True}
+    stream = await llm.chat.completions.create(model=MODEL, messages=messages, stream=True, **kwargs)
+    
+    content = []
+    tool_calls = {}
+    usage = None
+    async with stream:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            
+            if delta.content:
+                content.append(delta.content)
+                on_delta(delta.content)
+            
+            for tc in delta.tool_calls or []:
+                call = tool_calls.setdefault(tc.index, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if tc.id:
+                    call["id"] = tc.id
+                if tc.function and tc.function.name:
+                    call["function"]["name"] += tc.function.name
+                if tc.function and tc.function.arguments:
+                    call["function"]["arguments"] += tc.function.arguments
+    
+    message = {"role": "assistant", "content": "".join(content) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
+    llm_request_seconds.observe(time.perf_counter() - start, model=MODEL, mode="stream")
+    record_timing("llm", time.perf_counter() - start)
+    count_llm_tokens(messages, message, usage)
+    return message
 
 
-async def chat(session_id: str, user_message: str) -> str:
+async def chat(session_id: str, user_message: str, on_delta=None, stats: dict = None, on_tool_round=None) -> str:
+    """
+    Traite un message utilisateur dans un span racine 'chat'
+    
+    session_id et turn_id (reporté dans `stats`) sont recopiés sur tous les
+    spans du tour : appels LLM, outils, appels Sydia, notifications.
+    """
+    if stats is None:
+        stats = {}
+    stats["turn_id"] = os.urandom(6).hex()
+    _session_id.set(session_id)
+    
+    with span("chat", root=True, session_id=session_id, turn_id=stats["turn_id"]) as current:
+        content = await _chat(session_id, user_message, on_delta, stats, on_tool_round)
+        current.set(rounds=stats["rounds"], tokens_saved=stats["tokens_saved"],
+                    budget_exhausted=stats.get("budget_exhausted", False))
+        return content
+
+
+async def _chat(session_id: str, user_message: str, on_delta, stats: dict, on_tool_round=None) -> str:
+    """
+    Tour de conversation (voir chat)
+    
+    Enchaîne les rounds LLM → outils tant que le modèle demande des outils,
+    dans la limite de CHAT_MAX_TOOL_ROUNDS rounds et de CHAT_TURN_BUDGET secondes.
+    Une fois le budget épuisé, le modèle doit répondre sans outil.
+    on_tool_round(n) est appelé au début de chaque round d'outils : le texte
+    déjà streamé (« Je vérifie… ») ne fait pas partie de la réponse finale.
+    Le nombre de rounds et les tokens économisés par build_context sont
+    reportés dans `stats`.
+    """
     messages = get_messages(session_id)
     messages.append({"role": "user", "content": user_message})
     
-    response = azure_client.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        tools=TOOLS,
-        tool_choice="auto"
-    )
+    llm = get_azure_client()
+    deadline = time.monotonic() + CHAT_TURN_BUDGET
+    rounds = 0
     
-    assistant_message = response.choices[0].message
+    stats["tokens_saved"] = 0
     
-    if assistant_message.tool_calls:
+    while True:
+        context, saved = build_context(messages)
+        stats["tokens_saved"] += saved
+        
+        with span("llm", round=rounds, stream=on_delta is not None) as current:
+            if rounds < CHAT_MAX_TOOL_ROUNDS and time.monotonic() < deadline:
+                assistant_message = await complete(
+                    llm,
+                    context,
+                    on_delta=on_delta,
+                    tools=TOOLS,
+                    tool_choice="auto"
+                )
+            else:
+                assistant_message = await complete(llm, context, on_delta=on_delta)
+                stats["budget_exhausted"] = True
+                # Appel sans outils : d'éventuels tool_calls ne seraient jamais exécutés
+                assistant_message.pop("tool_calls", None)
+            tool_calls = len(assistant_message.get("tool_calls") or ())
+            current.set(tool_calls=tool_calls, final=tool_calls == 0)
+        
+        if not assistant_message.get("tool_calls"):
+            break
+        
+        rounds += 1
+        if on_tool_round is not None:
+            on_tool_round(rounds)
         messages.append(assistant_message)
         
-        for tool_call in assistant_message.tool_calls:
-            result = await execute_tool(
-                tool_call.function.name,
-                json.loads(tool_call.function.arguments)
-            )
+        results = await execute_tool_calls(assistant_message["tool_calls"])
+        for tool_call, result in zip(assistant_message["tool_calls"], results):
             messages.append({
                 "role": "tool",
-                "tool_call_id": tool_call.id,
+                "tool_call_id": tool_call["id"],
                 "content": result
             })
-        
-        final = azure_client.chat.completions.create(model=MODEL, messages=messages)
-        content = final.choices[0].message.content
-        messages.append({"role": "assistant", "content": content})
-        return content
     
-    content = assistant_message.content
+    content = assistant_message.get("content")
     messages.append({"role": "assistant", "content": content})
+    conversations.touch(session_id, messages)
+    
+    stats["rounds"] = rounds
+    log.info(
+        "Tour terminé: %s round(s) d'outils, ~%s tokens économisés", rounds, stats['tokens_saved'],
+        extra={"session_id": session_id}
+    )
     return content
 
 
@@ -2041,6 +4377,8 @@ HTML = """
             font-size: 14px;
         }
         .topbar-btn:hover { background: var(--surface); color: var(--text); border-color: var(--primary); }
+        .topbar-btn.active { color: var(--text); border-color: var(--primary); }
+        .msg-timing { opacity: 0.8; }
         
         /* CHAT */
         .chat-area {
@@ -2303,6 +4641,9 @@ HTML = """
                     <button class="topbar-btn" onclick="clearCurrentChat()" title="Effacer cette conversation">
                         <i class="fas fa-eraser"></i>
                     </button>
+                    <button class="topbar-btn" id="timings-btn" onclick="toggleTimings()" title="Afficher les temps de réponse">
+                        <i class="fas fa-stopwatch"></i>
+                    </button>
                     <button class="topbar-btn" title="Paramètres">
                         <i class="fas fa-cog"></i>
                     </button>
@@ -2630,15 +4971,14 @@ HTML = """
         // ========== FONCTIONS CHAT EXISTANTES ==========
         
         async function init() {
+            document.getElementById('timings-btn').classList.toggle('active', showTimings);
             try {
-                const r = await fetch('/api/sinistres');
+                const r = await fetch('/api/stats');
                 const d = await r.json();
                 if (d.success) {
-                    const o = d.sinistres.filter(s => s.statut === 1).length;
-                    const c = d.sinistres.length - o;
                     anim('stat-total', d.total);
-                    anim('stat-open', o);
-                    anim('stat-closed', c);
+                    anim('stat-open', d.open);
+                    anim('stat-closed', d.closed);
                     
                     document.getElementById('user-input').disabled = false;
                     document.getElementById('send-btn').disabled = false;
@@ -2671,14 +5011,18 @@ HTML = """
             }, 40);
         }
         
+        function formatMsg(txt) {
+            let fmt = txt.split('**').map((part, i) => i % 2 === 1 ? '<strong>' + part + '</strong>' : part).join('');
+            fmt = fmt.split('`').map((part, i) => i % 2 === 1 ? '<code>' + part + '</code>' : part).join('');
+            return fmt.split('\\n').join('<br>');
+        }
+        
         function addMsg(txt, isUser, save = true) {
             const chat = document.getElementById('chat');
             const typ = document.getElementById('typing-msg');
             const div = document.createElement('div');
             div.className = 'msg ' + (isUser ? 'user' : 'assistant');
-            let fmt = txt.split('**').map((part, i) => i % 2 === 1 ? '<strong>' + part + '</strong>' : part).join('');
-            fmt = fmt.split('`').map((part, i) => i % 2 === 1 ? '<code>' + part + '</code>' : part).join('');
-            fmt = fmt.split('\\n').join('<br>');
+            const fmt = formatMsg(txt);
             const now = new Date();
             const t = now.getHours().toString().padStart(2, '0') + ':' + now.getMinutes().toString().padStart(2, '0');
             div.innerHTML = '<div class="msg-avatar">' + (isUser ? '👤' : '🤖') + '</div><div><div class="msg-content">' + fmt + '</div><div class="msg-time"><i class="fas fa-' + (isUser ? 'check-double' : 'clock') + '"></i> ' + t + '</div></div>';
@@ -2696,6 +5040,27 @@ HTML = """
             if (save) {
                 saveMessage(txt, isUser);
             }
+            return div;
+        }
+        
+        // ========== TEMPS DE RÉPONSE (LLM / outils / Sydia) ==========
+        let showTimings = localStorage.getItem('sydia_timings') === '1';
+        const TIMING_LABELS = { llm: 'LLM', tool: 'Outils', sydia: 'Sydia', total: 'Total' };
+        
+        function toggleTimings() {
+            showTimings = !showTimings;
+            localStorage.setItem('sydia_timings', showTimings ? '1' : '0');
+            document.getElementById('timings-btn').classList.toggle('active', showTimings);
+        }
+        
+        function addTimings(div, timing) {
+            if (!showTimings || !div || !timing) return;
+            const parts = Object.keys(TIMING_LABELS)
+                .filter(k => timing[k] !== undefined)
+                .map(k => TIMING_LABELS[k] + ' ' + (timing[k] / 1000).toFixed(2) + ' s');
+            div.querySelector('.msg-time').insertAdjacentHTML(
+                'beforeend', '<span class="msg-timing">· <i class="fas fa-stopwatch"></i> ' + parts.join(' · ') + '</span>'
+            );
         }
                 
         // ========== TEXT-TO-SPEECH ==========
@@ -2761,18 +5126,39 @@ HTML = """
             document.getElementById('typing-dots').style.display = 'flex';
             document.getElementById('status-txt').textContent = 'En train d\\'écrire...';
             
+            // Bulle temporaire remplie token par token
+            let live = null;
+            let liveText = '';
+            const onDelta = (t) => {
+                if (!live) {
+                    typ.style.display = 'none';
+                    live = document.createElement('div');
+                    live.className = 'msg assistant';
+                    live.innerHTML = '<div class="msg-avatar">🤖</div><div><div class="msg-content"></div></div>';
+                    document.getElementById('chat').insertBefore(live, typ);
+                }
+                liveText += t;
+                live.querySelector('.msg-content').innerHTML = formatMsg(liveText);
+                document.getElementById('chat').scrollTop = document.getElementById('chat').scrollHeight;
+            };
+            // Round d'outils : le texte intermédiaire n'est pas la réponse, on repart de zéro
+            const onReset = () => {
+                if (live) live.remove();
+                live = null;
+                liveText = '';
+                typ.style.display = 'flex';
+            };
+            
+            let stats = null;
             try {
-                const r = await fetch('/chat', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ message: m, session_id: currentSessionId })
-                });
-                const d = await r.json();
+                const response = await streamChat(m, onDelta, (s) => { stats = s; }, onReset);
+                if (live) live.remove();
                 typ.style.display = 'none';
                 document.getElementById('typing-dots').style.display = 'none';
                 document.getElementById('status-txt').textContent = 'Connecté à Sydia';
-                addMsg(d.response, false);
+                addTimings(addMsg(response, false), stats && stats.timing);
             } catch(e) {
+                if (live) live.remove();
                 typ.style.display = 'none';
                 addMsg('❌ Erreur de connexion.', false);
             }
@@ -2781,6 +5167,43 @@ HTML = """
             inp.focus();
         }
         
+        // ========== STREAMING (Server-Sent Events) ==========
+        async function streamChat(m, onDelta, onStats, onReset) {
+            const r = await fetch('/chat/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ message: m, session_id: currentSessionId })
+            });
+            const reader = r.body.getReader();
+            const decoder = new TextDecoder();
+            let buf = '';
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buf += decoder.decode(value, { stream: true });
+                
+                let idx;
+                while ((idx = buf.indexOf('\\n\\n')) >= 0) {
+                    const raw = buf.slice(0, idx);
+                    buf = buf.slice(idx + 2);
+                    let event = 'message';
+                    let data = '';
+                    raw.split('\\n').forEach(line => {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    });
+                    const payload = JSON.parse(data);
+                    if (event === 'delta') onDelta(payload);
+                    else if (event === 'reset' && onReset) onReset(payload);
+                    else if (event === 'stats' && onStats) onStats(payload);
+                    else if (event === 'done') return payload;
+                    else if (event === 'error') throw new Error(payload);
+                }
+            }
+            throw new Error('Flux interrompu');
+        }
+        
         function send(t) {
             document.getElementById('user-input').value = t;
             sendMessage();
@@ -2874,68 +5297,389 @@ HTML = """
 """
 
 
+# =========================================================================
+# STATISTIQUES DU TABLEAU DE BORD
+# =========================================================================
+
+class StaleWhileRevalidate:
+    """
+    Valeur calculée par `compute`, servie depuis le cache
+    
+    Plus vieille que `ttl` : servie telle quelle et recalculée en tâche de fond.
+    Invalidée : recalculée aussitôt en tâche de fond, l'ancienne valeur reste
+    servie (marquée périmée) en attendant.
+    Plus vieille que `max_stale` (ou absente) : recalculée avant de répondre.
+    `compute` renvoie un dict {"success": ...} ; un échec garde l'ancienne valeur.
+    """
+    
+    def __init__(self, compute, ttl: float, max_stale: float):
+        self.compute = compute
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.value = None
+        self.updated_at = 0.0
+        self._task = None
+        self._generation = 0
+        self._invalid = False
+    
+    def age(self) -> float:
+        return time.monotonic() - self.updated_at
+    
+    def stale(self) -> bool:
+        return self._invalid or self.age() > self.ttl
+    
+    def invalidate(self):
+        """Après une écriture : recalcul lancé en tâche de fond (boucle courante)"""
+        self._generation += 1
+        self._task = None  # un recalcul déjà lancé peut avoir lu l'état d'avant l'écriture
+        self._invalid = True
+        self.refresh()
+    
+    async def get(self) -> dict:
+        if self.value is None or self.age() > self.max_stale:
+            result = await self.refresh()
+            return self.value or result
+        if self.stale():
+            self.refresh()
+        return self.value
+    
+    def refresh(self):
+        """Lance un recalcul (un seul à la fois) et renvoie un awaitable"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run(self._generation))
+        return asyncio.shield(self._task)
+    
+    async def _run(self, generation: int) -> dict:
+        try:
+            result = await self.compute()
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        if result.get("success") and generation != self._generation:
+            log.debug("Statistiques invalidées pendant le calcul, résultat ignoré")
+        elif result.get("success"):
+            self.value = result
+            self.updated_at = time.monotonic()
+            self._invalid = False
+        else:
+            log.warning("Statistiques non rafraîchies: %s", result.get('error'))
+        return result
+
+
+async def compute_stats() -> dict:
+    """Agrège tous les sinistres : statut, type, fraude, mécontentement"""
+    total = ouverts = 0
+    by_type = {}
+    by_fraude = {"0": 0, "1": 0}
+    by_mecontent = {"0": 0, "1": 0}
+    
+    try:
+        async for page in iter_sinistres():
+            for s in page:
+                total += 1
+                if s.get("statut") == 1:
+                    ouverts += 1
+                type_sinistre = str(s.get("type_sinistre", "?"))
+                by_type[type_sinistre] = by_type.get(type_sinistre, 0) + 1
+                by_fraude["1" if s.get("fraude") == 1 else "0"] += 1
+                by_mecontent["1" if s.get("mecontent") == 1 else "0"] += 1
+    except RuntimeError as e:
+        return {"success": False, "error": str(e)}
+    
+    return {
+        "success": True,
+        "total": total,
+        "open": ouverts,
+        "closed": total - ouverts,
+        "by_type": by_type,
+        "by_fraude": by_fraude,
+        "by_mecontent": by_mecontent,
+        "computed_at": time.time()
+    }
+
+
+stats_cache = StaleWhileRevalidate(compute_stats, ttl=STATS_TTL, max_stale=STATS_MAX_STALE)
+
+
+async def dashboard_stats() -> dict:
+    """Statistiques précalculées pour /api/stats"""
+    stats = await stats_cache.get()
+    if not stats.get("success"):
+        return stats
+    return {**stats, "age": round(stats_cache.age(), 1), "stale": stats_cache.stale()}
+
+
+# =========================================================================
+# LOGIQUE DES ROUTES (partagée avec le mode ASGI, voir asgi.py)
+# =========================================================================
+
+async def sinistres_overview(limit: int = 50, offset: int = 0) -> dict:
+    """Données du tableau de bord : compteurs + une page de sinistres"""
+    async def page():
+        if limit <= 0:
+            return {"success": True, "data": []}
+        return await list_sinistres(limit=limit, offset=offset)
+    
+    counts, result = await asyncio.gather(count_sinistres(), page())
+    
+    if counts["success"] and result["success"]:
+        sinistres = [{"id": s.get("id"), "ref": s.get("ref_assureur") or s.get("ref_courtier"), "statut": s.get("statut")} for s in result["data"]]
+        return {
+            "success": True,
+            "total": counts["total"],
+            "open": counts["open"],
+            "closed": counts["closed"],
+            "limit": limit,
+            "offset": offset,
+            "sinistres": sinistres
+        }
+    return {"success": False, "error": counts.get("error") or result.get("error")}
+
+
+def cache_stats() -> dict:
+    return {
+        "sinistre": sinistre_cache.stats(),
+        "sinistre_index": sinistre_index.stats(),
+        "documents": document_cache.stats(),
+        "prefetch": {**prefetch_cache.stats(), **prefetcher.stats()},
+        "sydia_coalesced": sydia_coalesced
+    }
+
+
+async def chat_payload(session_id: str, message: str) -> dict:
+    """Réponse JSON de /chat"""
+    stats = {}
+    response = await chat(session_id, message, stats=stats)
+    return {
+        'response': response,
+        'rounds': stats.get('rounds', 0),
+        'tokens_saved': stats.get('tokens_saved', 0),
+        'turn_id': stats.get('turn_id')
+    }
+
+
+def sse_event(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def upload_document(data: dict) -> dict:
+    """Upload un document (contenu base64 dans le JSON)"""
+    upload_data = {
+        "id_sinistre": str(data.get("id_sinistre")),
+        "filename": data.get("filename"),
+        "commentaire": data.get("commentaire", ""),
+        "content": data.get("content"),
+        "public": "1",
+        "notif_gestionnaire": "1",
+    }
+    
+    response = await sydia_call("ged/add", upload_data)
+    invalidate_sinistre(id_sinistre=data.get("id_sinistre"))
+    log.debug("upload response: %s", Payload(response))
+    
+    if response.get("status") == 200:
+        return {
+            "success": True,
+            "id_ged": response.get("id_ged"),
+            "id_assure": response.get("id_assure")
+        }
+    return {"success": False, "error": response.get("message", "Erreur upload")}
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UploadSpool:
+    """Corps d'upload en mémoire jusqu'à UPLOAD_SPOOL_THRESHOLD, sur disque au-delà"""
+    
+    def __init__(self, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.file = tempfile.SpooledTemporaryFile(
+            max_size=UPLOAD_SPOOL_THRESHOLD, dir=UPLOAD_SPOOL_DIR
+        )
+    
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Fichier trop volumineux (max {self.max_bytes} octets)")
+        self.file.write(chunk)
+    
+    def rewind(self):
+        self.file.seek(0)
+        return self.file
+    
+    def close(self):
+        self.file.close()
+
+
+async def upload_document_stream(fields: dict, fileobj) -> dict:
+    """Upload un document depuis un fichier (multipart ou corps brut déjà spoolé)"""
+    id_sinistre = fields.get("id_sinistre")
+    filename = fields.get("filename")
+    if not id_sinistre or not filename:
+        return {"success": False, "error": "id_sinistre et filename requis"}
+    
+    return await add_document(id_sinistre, filename, fields.get("commentaire", ""), content=fileobj)
+
+
+# =========================================================================
+# ROUTES FLASK
+# =========================================================================
+
 @app.route('/')
 def index():
     return render_template_string(HTML)
 
 
+def timed_json(coro):
+    """Exécute coro sur la boucle de fond ; réponse JSON avec en-tête Server-Timing"""
+    timing = ServerTiming()
+    result = run_async(timing.run(coro))
+    with timing.measure("serialize"):
+        response = jsonify(result)
+    response.headers['Server-Timing'] = timing.header()
+    return response
+
+
 @app.route('/api/sinistres')
 def api_sinistres():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(list_sinistres())
-    loop.close()
-    
-    if result["success"]:
-        sinistres = [{"id": s.get("id"), "ref": s.get("ref_assureur") or s.get("ref_courtier"), "statut": s.get("statut")} for s in result["data"]]
-        return jsonify({"success": True, "total": len(sinistres), "sinistres": sinistres})
-    return jsonify({"success": False, "error": result["error"]})
+    return timed_json(sinistres_overview(
+        limit=request.args.get('limit', 50, type=int),
+        offset=request.args.get('offset', 0, type=int)
+    ))
+
+
+@app.route('/api/stats')
+def api_stats():
+    return jsonify(run_async(dashboard_stats()))
+
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    return jsonify(cache_stats())
+
+
+@app.route('/api/conversations/stats')
+def api_conversations_stats():
+    return jsonify(conversations.stats())
 
 
 @app.route('/chat', methods=['POST'])
 def chat_route():
     data = request.json
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    response = loop.run_until_complete(chat(data.get('session_id', 'default'), data.get('message', '')))
-    loop.close()
-    return jsonify({'response': response})
+    return timed_json(chat_payload(data.get('session_id', 'default'), data.get('message', '')))
+
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream_route():
+    """Réponse de l'agent en streaming (Server-Sent Events)"""
+    data = request.json
+    session_id = data.get('session_id', 'default')
+    message = data.get('message', '')
+    events = asyncio.Queue()  # alimentée et lue sur la boucle de fond
+    stats = {}
+    timing = ServerTiming()  # en-têtes déjà partis : la répartition va dans l'événement 'stats'
+    
+    async def run():
+        try:
+            response = await timing.run(
+                chat(session_id, message, on_delta=lambda t: events.put_nowait(('delta', t)), stats=stats,
+                     on_tool_round=lambda n: events.put_nowait(('reset', n)))
+            )
+            stats['timing'] = timing.summary()
+            events.put_nowait(('stats', stats))
+            events.put_nowait(('done', response))
+        except Exception as e:
+            events.put_nowait(('error', str(e)))
+    
+    submit_async(run())
+    
+    def generate():
+        while True:
+            event, payload = run_async(events.get())
+            yield sse_event(event, payload)
+            if event in ('done', 'error'):
+                break
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@socketio.on('connect')
+def on_connect():
+    socketio_clients.inc()
+
+
+@socketio.on('disconnect')
+def on_disconnect(*args):
+    socketio_clients.dec()
 
 
 @app.route('/api/upload', methods=['POST'])
 def upload_route():
     """Upload un document via l'API"""
-    data = request.json
+    return timed_json(upload_document(request.json))
+
+
+@app.route('/api/documents/<sha256>')
+def download_document(sha256):
+    """Télécharge un PDF généré (Range et ETag gérés par send_file)"""
+    path = document_cache.path(sha256)
+    if path is None:
+        return jsonify({"success": False, "error": "Document introuvable"}), 404
+    return send_file(
+        path,
+        mimetype='application/pdf',
+        download_name=request.args.get('filename') or f"{sha256}.pdf",
+        conditional=True,
+        etag=sha256,
+        max_age=86400
+    )
+
+
+@app.route('/api/upload/stream', methods=['POST'])
+def upload_stream_route():
+    """
+    Upload en flux : multipart (champ 'file') ou corps brut
     
-    async def do_upload():
-        upload_data = {
-            "id_sinistre": str(data.get("id_sinistre")),
-            "filename": data.get("filename"),
-            "commentaire": data.get("commentaire", ""),
-            "content": data.get("content"),
-            "public": "1",
-            "notif_gestionnaire": "1",
-        }
-        
-        response = await sydia_call("ged/add", upload_data)
-        print(f"DEBUG upload response: {response}")
-        
-        if response.get("status") == 200:
-            return {
-                "success": True,
-                "id_ged": response.get("id_ged"),
-                "id_assure": response.get("id_assure")
-            }
-        return {"success": False, "error": response.get("message", "Erreur upload")}
+    Corps brut : id_sinistre, filename et commentaire en paramètres d'URL.
+    """
+    if request.content_length and request.content_length > UPLOAD_MAX_BYTES:
+        return jsonify({"success": False, "error": f"Fichier trop volumineux (max {UPLOAD_MAX_BYTES} octets)"}), 413
     
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    result = loop.run_until_complete(do_upload())
-    loop.close()
-    return jsonify(result)
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({"success": False, "error": "Champ 'file' manquant"}), 400
+        # Werkzeug spoole déjà les parties volumineuses sur disque
+        upload.stream.seek(0, os.SEEK_END)
+        if upload.stream.tell() > UPLOAD_MAX_BYTES:
+            return jsonify({"success": False, "error": f"Fichier trop volumineux (max {UPLOAD_MAX_BYTES} octets)"}), 413
+        upload.stream.seek(0)
+        fields = {**request.form.to_dict(), "filename": request.form.get('filename') or upload.filename}
+        return timed_json(upload_document_stream(fields, upload.stream))
+    
+    spool = UploadSpool()
+    try:
+        while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+            spool.write(chunk)
+        return timed_json(upload_document_stream(request.args.to_dict(), spool.rewind()))
+    except UploadTooLarge as e:
+        return jsonify({"success": False, "error": str(e)}), 413
+    finally:
+        spool.close()
 
 
 if __name__ == '__main__':
+    port = int(os.getenv("PORT", "5000"))
     print("=" * 50)
     print("🤖 AGENT SYDIA + WebSocket")
     print("=" * 50)
@@ -2943,6 +5687,8 @@ if __name__ == '__main__':
     print(f"📡 API: {SYDIA_URL}")
     print(f"📡 WebSocket: Activé")
     print()
-    print("🌐 http://localhost:5000")
+    print(f"🌐 http://localhost:{port}")
     print()
-    socketio.run(app, debug=False, host='0.0.0.0', port=5000)
+    get_loop().call_soon_threadsafe(stats_cache.refresh)
+    get_loop().call_soon_threadsafe(start_mirror_sync)
+    socketio.run(app, debug=False, host='0.0.0.0', port=port)
@@ -0,0 +1,218 @@
+"""
+Agent Sydia - Mode ASGI
+
+Sert les mêmes routes que app.py (/, /chat, /chat/stream, /api/sinistres,
+/api/upload, /api/upload/stream) et le canal Socket.IO 'sydia_update' sur une
+seule boucle asyncio : les handlers attendent directement les clients Sydia et LLM.
+
+Usage:
+    pipenv run uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Le mode historique (Flask + Flask-SocketIO) reste disponible :
+    pipenv run python app.py
+"""
+
+import asyncio
+import contextlib
+
+import socketio
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import app as agent
+
+
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+
+# Garde une référence sur les émissions en cours (sinon collectées en route)
+_pending_emits = set()
+
+
+def emit_update(payload: dict):
+    """Diffuse 'sydia_update' depuis la boucle courante"""
+    task = asyncio.get_running_loop().create_task(sio.emit('sydia_update', payload))
+    _pending_emits.add(task)
+    task.add_done_callback(_pending_emits.discard)
+
+
+agent.set_update_emitter(emit_update)
+
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    agent.socketio_clients.inc()
+
+
+@sio.event
+async def disconnect(sid, *args):
+    agent.socketio_clients.dec()
+
+
+async def timed_json(coro):
+    """Réponse JSON avec en-tête Server-Timing (LLM, outils, Sydia, sérialisation)"""
+    timing = agent.ServerTiming()
+    result = await timing.run(coro)
+    with timing.measure('serialize'):
+        response = JSONResponse(result)
+    response.headers['Server-Timing'] = timing.header()
+    return response
+
+
+async def index(request):
+    return HTMLResponse(agent.HTML)
+
+
+async def api_sinistres(request):
+    return await timed_json(agent.sinistres_overview(
+        limit=int(request.query_params.get('limit', 50)),
+        offset=int(request.query_params.get('offset', 0))
+    ))
+
+
+async def api_stats(request):
+    return JSONResponse(await agent.dashboard_stats())
+
+
+async def api_cache_stats(request):
+    return JSONResponse(agent.cache_stats())
+
+
+async def api_conversations_stats(request):
+    return JSONResponse(agent.conversations.stats())
+
+
+async def metrics(request):
+    return PlainTextResponse(agent.render_metrics(), media_type='text/plain; version=0.0.4')
+
+
+async def chat_route(request):
+    data = await request.json()
+    return await timed_json(agent.chat_payload(data.get('session_id', 'default'), data.get('message', '')))
+
+
+async def chat_stream_route(request):
+    """Réponse de l'agent en streaming (Server-Sent Events)"""
+    data = await request.json()
+    events = asyncio.Queue()
+    stats = {}
+    timing = agent.ServerTiming()
+
+    async def run():
+        try:
+            response = await timing.run(agent.chat(
+                data.get('session_id', 'default'),
+                data.get('message', ''),
+                on_delta=lambda t: events.put_nowait(('delta', t)),
+                stats=stats,
+                on_tool_round=lambda n: events.put_nowait(('reset', n))
+            ))
+            stats['timing'] = timing.summary()
+            events.put_nowait(('stats', stats))
+            events.put_nowait(('done', response))
+        except Exception as e:
+            events.put_nowait(('error', str(e)))
+
+    task = asyncio.create_task(run())
+
+    async def generate():
+        try:
+            while True:
+                event, payload = await events.get()
+                yield agent.sse_event(event, payload)
+                if event in ('done', 'error'):
+                    break
+        finally:
+            await task
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+async def upload_route(request):
+    """Upload un document via l'API"""
+    return await timed_json(agent.upload_document(await request.json()))
+
+
+async def download_document(request):
+    """Télécharge un PDF généré (Range géré par FileResponse, ETag = sha256)"""
+    sha256 = request.path_params['sha256']
+    path = agent.document_cache.path(sha256)
+    if path is None:
+        return JSONResponse({"success": False, "error": "Document introuvable"}, status_code=404)
+    etag = f'"{sha256}"'
+    headers = {"etag": etag, "cache-control": "public, max-age=86400"}
+    if etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        path,
+        media_type='application/pdf',
+        filename=request.query_params.get('filename') or f"{sha256}.pdf",
+        headers=headers
+    )
+
+
+async def upload_stream_route(request):
+    """Upload en flux : multipart (champ 'file') ou corps brut (champs en paramètres d'URL)"""
+    too_large = JSONResponse(
+        {"success": False, "error": f"Fichier trop volumineux (max {agent.UPLOAD_MAX_BYTES} octets)"},
+        status_code=413
+    )
+    if int(request.headers.get('content-length') or 0) > agent.UPLOAD_MAX_BYTES:
+        return too_large
+
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        async with request.form(max_files=1) as form:
+            upload = form.get('file')
+            if upload is None or isinstance(upload, str):
+                return JSONResponse({"success": False, "error": "Champ 'file' manquant"}, status_code=400)
+            # Starlette spoole déjà les fichiers volumineux sur disque
+            if upload.size is not None and upload.size > agent.UPLOAD_MAX_BYTES:
+                return too_large
+            await upload.seek(0)
+            fields = {k: v for k, v in form.items() if isinstance(v, str)}
+            fields.setdefault('filename', upload.filename)
+            return await timed_json(agent.upload_document_stream(fields, upload.file))
+
+    spool = agent.UploadSpool()
+    try:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        return await timed_json(agent.upload_document_stream(dict(request.query_params), spool.rewind()))
+    except agent.UploadTooLarge:
+        return too_large
+    finally:
+        spool.close()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    agent.stats_cache.refresh()
+    mirror_task = agent.start_mirror_sync()
+    yield
+    if mirror_task is not None:
+        mirror_task.cancel()
+    agent.prefetcher.cancel()
+    await agent.close_clients()
+
+
+starlette_app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/api/sinistres', api_sinistres),
+        Route('/api/stats', api_stats),
+        Route('/api/cache/stats', api_cache_stats),
+        Route('/api/conversations/stats', api_conversations_stats),
+        Route('/metrics', metrics),
+        Route('/chat', chat_route, methods=['POST']),
+        Route('/chat/stream', chat_stream_route, methods=['POST']),
+        Route('/api/upload', upload_route, methods=['POST']),
+        Route('/api/upload/stream', upload_stream_route, methods=['POST']),
+        Route('/api/documents/{sha256}', download_document),
+    ],
+    lifespan=lifespan,
+)
+
+application = socketio.ASGIApp(sio, other_asgi_app=starlette_app)
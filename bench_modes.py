@@ -0,0 +1,123 @@
+"""
+Benchmark : mode Flask/gevent (app.py) vs mode ASGI (asgi.py)
+
+Lance chaque serveur dans un sous-processus, envoie des requêtes en parallèle
+pendant une durée fixe et compare requêtes/seconde et latences.
+
+Usage:
+    pipenv run python bench_modes.py
+    pipenv run python bench_modes.py --path /api/sinistres --concurrency 50 --duration 20
+
+Les routes qui appellent Sydia utilisent SYDIA_API_URL ; hors ligne, lancer
+d'abord le simulateur local :
+    pipenv run python sydia_simulator.py --port 8800
+    SYDIA_API_URL=http://127.0.0.1:8800 pipenv run python bench_modes.py --path /api/sinistres
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+
+MODES = {
+    "flask": lambda port: [sys.executable, "app.py"],
+    "asgi": lambda port: [
+        sys.executable, "-m", "uvicorn", "asgi:application",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"
+    ],
+}
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Serveur injoignable: {url}")
+
+
+async def load(url: str, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    stop = time.monotonic() + duration
+
+    async def worker(client):
+        nonlocal errors
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        started = time.monotonic()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+    }
+
+
+def run_mode(mode: str, port: int, args) -> dict:
+    env = {**os.environ, "PORT": str(port)}
+    proc = subprocess.Popen(
+        MODES[mode](port),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_ready(base + "/api/cache/stats"))
+        # Chauffe : ouvre les pools avant la mesure
+        asyncio.run(load(base + args.path, args.concurrency, 1.0))
+        return asyncio.run(load(base + args.path, args.concurrency, args.duration))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/api/cache/stats", help="Route GET à mesurer")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée de mesure (s)")
+    parser.add_argument("--modes", default="flask,asgi")
+    parser.add_argument("--port", type=int, default=5100)
+    args = parser.parse_args()
+
+    print(f"GET {args.path} | concurrence {args.concurrency} | {args.duration:.0f}s par mode")
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'erreurs':>10}")
+    for i, mode in enumerate(args.modes.split(",")):
+        r = run_mode(mode, args.port + i, args)
+        print(f"{mode:<8}{r['rps']:>10.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}{r['errors']:>10}")
+
+
+if __name__ == "__main__":
+    main()
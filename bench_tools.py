@@ -0,0 +1,156 @@
+"""
+Test de charge : sydia_call et execute_tool contre le simulateur Sydia local
+
+Lance sydia_simulator.py dans un sous-processus, puis appelle en parallèle
+des lectures Sydia (sydia_call) ou des outils de l'agent (execute_tool) sur
+des sinistres tirés au hasard, pendant une durée fixe.
+
+Usage:
+    pipenv run python bench_tools.py
+    pipenv run python bench_tools.py --target execute_tool --concurrency 50 --duration 20
+    pipenv run python bench_tools.py --cold --sim-args "--latency-ms 100 --jitter-ms 40 --error-rate 0.02"
+"""
+
+import os
+import sys
+import time
+import shlex
+import random
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+
+READS = ["sinistre/get", "ged/list", "sinistre/checklist/get", "sinistre/reglement/list"]
+TOOLS = ["identifier_assure", "get_sinistre", "list_documents", "verifier_checklist", "list_reglements"]
+
+
+def start_simulator(port: int, extra: str) -> subprocess.Popen:
+    # Un ancien simulateur sur ce port répondrait à la place du nouveau (qui, lui, échouerait au bind)
+    try:
+        httpx.get(f"http://127.0.0.1:{port}/_stats")
+        raise RuntimeError(f"Port {port} déjà utilisé (ancien simulateur ?)")
+    except httpx.TransportError:
+        pass
+    proc = subprocess.Popen(
+        [sys.executable, "sydia_simulator.py", "--port", str(port), *shlex.split(extra)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Simulateur arrêté au démarrage (code {proc.returncode})")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/_stats")
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Simulateur injoignable")
+
+
+def call_factory(agent, target: str, sinistres: list):
+    """Renvoie une fonction qui produit un appel (libellé, coroutine) au hasard"""
+    def sydia():
+        s = random.choice(sinistres)
+        endpoint = random.choice(READS)
+        data = {"limit": "50"} if endpoint == "sinistre/reglement/list" else {"id_sinistre": str(s["id"])}
+        return endpoint, agent.sydia_call(endpoint, data)
+
+    def tool():
+        s = random.choice(sinistres)
+        name = random.choice(TOOLS)
+        arguments = {
+            "identifier_assure": {"ref_sinistre": s["ref_assureur"], "nom": s["assure"]["nom"],
+                                  "prenom": s["assure"]["prenom"]},
+            "get_sinistre": {"ref_sinistre": s["ref_assureur"]},
+            "list_documents": {"id_sinistre": s["id"]},
+            "verifier_checklist": {"ref_sinistre": s["ref_assureur"]},
+            "list_reglements": {"limit": 20},
+        }[name]
+        return name, agent.execute_tool(name, arguments)
+
+    return sydia if target == "sydia_call" else tool
+
+
+def is_error(target: str, result) -> bool:
+    if target == "sydia_call":
+        return result.get("status") != 200
+    return result.startswith("❌")
+
+
+async def load(agent, target: str, concurrency: int, duration: float) -> dict:
+    sinistres = []
+    async for page in agent.iter_sinistres(use_mirror=False):
+        sinistres += page
+    make_call = call_factory(agent, target, sinistres)
+
+    latencies = {}
+    errors = {}
+    stop = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < stop:
+            label, coro = make_call()
+            start = time.perf_counter()
+            try:
+                failed = is_error(target, await coro)
+            except Exception:
+                failed = True
+            latencies.setdefault(label, []).append(time.perf_counter() - start)
+            errors[label] = errors.get(label, 0) + failed
+
+    started = time.monotonic()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return {"elapsed": time.monotonic() - started, "latencies": latencies, "errors": errors,
+            "sinistres": len(sinistres)}
+
+
+def pct(values: list, p: float) -> float:
+    return values[min(int(len(values) * p), len(values) - 1)] * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="sydia_call", choices=["sydia_call", "execute_tool"])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée de mesure (s)")
+    parser.add_argument("--port", type=int, default=8800, help="Port du simulateur")
+    parser.add_argument("--sim-args", default="", help="Options passées à sydia_simulator.py")
+    parser.add_argument("--cold", action="store_true", help="Désactive caches et préchargement de l'agent")
+    args = parser.parse_args()
+
+    # Configuration lue à l'import de app.py
+    os.environ["SYDIA_API_URL"] = f"http://127.0.0.1:{args.port}"
+    if args.cold:
+        os.environ.update({"SINISTRE_CACHE_TTL": "0", "PREFETCH_ENABLED": "0"})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    proc = start_simulator(args.port, args.sim_args)
+    try:
+        import app as agent
+
+        result = agent.run_async(load(agent, args.target, args.concurrency, args.duration))
+        stats = httpx.get(f"http://127.0.0.1:{args.port}/_stats").json()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    total = sum(len(v) for v in result["latencies"].values())
+    print(f"{args.target} | concurrence {args.concurrency} | {args.duration:.0f}s | "
+          f"{result['sinistres']} sinistres | {'à froid' if args.cold else 'caches actifs'}")
+    print(f"{'appel':<26}{'n':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'erreurs':>10}")
+    for label, values in sorted(result["latencies"].items()):
+        values.sort()
+        print(f"{label:<26}{len(values):>8}{pct(values, 0.5):>10.1f}{pct(values, 0.95):>10.1f}"
+              f"{pct(values, 0.99):>10.1f}{result['errors'][label]:>10}")
+    print(f"débit : {total / result['elapsed']:.1f} appels/s")
+    print(f"requêtes reçues par le simulateur : {sum(stats['calls'].values())} "
+          f"(fusionnées côté agent : {agent.sydia_coalesced})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark mémoire : /api/upload (JSON base64) vs /api/upload/stream
+
+Démarre un faux Sydia local (aiohttp, draine le corps de ged/add), lance
+le serveur (app.py ou asgi.py) dans un sous-processus neuf par mode et envoie
+des PDF de taille fixe. Mesure le pic de mémoire résidente (VmHWM, Linux) du
+serveur au-dessus de son niveau au repos.
+
+Usage:
+    pipenv run python bench_upload.py
+    pipenv run python bench_upload.py --size-mb 20 --count 3 --server asgi
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import httpx
+from aiohttp import web
+
+
+SERVERS = {
+    "flask": lambda port: [sys.executable, "app.py"],
+    "asgi": lambda port: [
+        sys.executable, "-m", "uvicorn", "asgi:application",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"
+    ],
+}
+
+
+def start_fake_sydia(port: int):
+    """Faux Sydia : répond 200 à tout, lit les corps par morceaux"""
+    received = {"bytes": 0}
+
+    async def handler(request):
+        async for chunk in request.content.iter_chunked(64 * 1024):
+            received["bytes"] += len(chunk)
+        return web.json_response({"status": 200, "id_ged": 1, "id_assure": 1, "data": {"count": 0, "sinistres": []}})
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = web.Application(client_max_size=0)
+        server.router.add_route("*", "/{tail:.*}", handler)
+        runner = web.AppRunner(server)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    return received
+
+
+def memory_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Serveur injoignable: {url}")
+
+
+def send(mode: str, base: str, path: str):
+    filename = os.path.basename(path)
+    with open(path, "rb") as f:
+        if mode == "json":
+            content = base64.b64encode(f.read()).decode()
+            return httpx.post(f"{base}/api/upload", timeout=120.0, json={
+                "id_sinistre": 1, "filename": filename, "content": content
+            })
+        if mode == "raw":
+            return httpx.post(
+                f"{base}/api/upload/stream",
+                params={"id_sinistre": 1, "filename": filename},
+                content=f, timeout=120.0,
+                headers={"Content-Length": str(os.path.getsize(path)), "Content-Type": "application/pdf"}
+            )
+        return httpx.post(
+            f"{base}/api/upload/stream",
+            data={"id_sinistre": "1"}, files={"file": (filename, f, "application/pdf")}, timeout=120.0
+        )
+
+
+def run_mode(mode: str, port: int, sydia_port: int, path: str, args) -> dict:
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "SYDIA_API_URL": f"http://127.0.0.1:{sydia_port}",
+        "UPLOAD_MAX_BYTES": str(2 * args.size_mb * 1024 * 1024),
+    }
+    proc = subprocess.Popen(
+        SERVERS[args.server](port),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_ready(base + "/api/cache/stats")
+        idle = memory_kb(proc.pid, "VmRSS")
+        errors = 0
+        started = time.monotonic()
+        for _ in range(args.count):
+            response = send(mode, base, path)
+            if response.status_code != 200 or not response.json().get("success"):
+                errors += 1
+        elapsed = time.monotonic() - started
+        peak = memory_kb(proc.pid, "VmHWM")
+        return {"idle": idle / 1024, "peak": peak / 1024, "delta": (peak - idle) / 1024,
+                "seconds": elapsed / args.count, "errors": errors}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=20, help="Taille du PDF envoyé (Mo)")
+    parser.add_argument("--count", type=int, default=3, help="Uploads par mode")
+    parser.add_argument("--modes", default="json,raw,multipart")
+    parser.add_argument("--server", default="flask", choices=SERVERS)
+    parser.add_argument("--port", type=int, default=5200)
+    args = parser.parse_args()
+
+    sydia_port = args.port + 99
+    received = start_fake_sydia(sydia_port)
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(b"%PDF-1.4\n")
+        f.write(os.urandom(args.size_mb * 1024 * 1024))
+        path = f.name
+
+    try:
+        print(f"{args.server} | PDF {args.size_mb} Mo x {args.count}")
+        print(f"{'mode':<11}{'repos Mo':>10}{'pic Mo':>10}{'Δ Mo':>10}{'s/upload':>10}{'erreurs':>10}")
+        for i, mode in enumerate(args.modes.split(",")):
+            r = run_mode(mode, args.port + i, sydia_port, path, args)
+            print(f"{mode:<11}{r['idle']:>10.1f}{r['peak']:>10.1f}{r['delta']:>10.1f}{r['seconds']:>10.2f}{r['errors']:>10}")
+        print(json.dumps({"sydia_bytes_received": received["bytes"]}))
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+Simulateur local de l'API Sydia (/api/v2/*)
+
+Sert les endpoints utilisés par l'agent à partir de données générées de façon
+déterministe (--seed), avec latence, gigue et taux d'erreur réglables par
+endpoint. Les écritures (sinistre/add, ged/add, assure/update, ...) modifient
+l'état en mémoire.
+
+Usage:
+    pipenv run python sydia_simulator.py --port 8800
+    SYDIA_API_URL=http://127.0.0.1:8800 pipenv run python app.py
+
+    # Profil par endpoint (JSON) : {"sinistre/list": {"latency_ms": 400, "jitter_ms": 100, "error_rate": 0.02}}
+    pipenv run python sydia_simulator.py --profile profil.json --latency-ms 80 --error-rate 0.01
+"""
+
+import json
+import random
+import asyncio
+import argparse
+from datetime import date, timedelta
+from urllib.parse import unquote_plus
+
+from aiohttp import web
+
+
+# Latence médiane (ms) par défaut, proportionnée au coût des endpoints réels
+DEFAULT_PROFILE = {
+    "sinistre/get": {"latency_ms": 80},
+    "sinistre/list": {"latency_ms": 250},
+    "sinistre/add": {"latency_ms": 300},
+    "sinistre/contact": {"latency_ms": 150},
+    "sinistre/cloturer": {"latency_ms": 150},
+    "sinistre/reglement/list": {"latency_ms": 120},
+    "sinistre/checklist/get": {"latency_ms": 60},
+    "ged/list": {"latency_ms": 70},
+    "ged/get": {"latency_ms": 90},
+    "ged/add": {"latency_ms": 200},
+    "ged/document/get": {"latency_ms": 600},
+    "assure/update": {"latency_ms": 120},
+}
+
+NOMS = ["MARTIN", "BERNARD", "DUBOIS", "THOMAS", "ROBERT", "RICHARD", "PETIT", "DURAND",
+        "LEROY", "MOREAU", "SIMON", "LAURENT", "LEFEBVRE", "MICHEL", "GARCIA", "DAVID"]
+PRENOMS = ["JEAN", "MARIE", "PIERRE", "SOPHIE", "LUC", "CLAIRE", "PAUL", "JULIE",
+           "NICOLAS", "CAMILLE", "LOUIS", "EMMA", "HUGO", "LEA", "THEO", "CHLOE"]
+VILLES = [("75011", "PARIS"), ("69003", "LYON"), ("13008", "MARSEILLE"), ("33000", "BORDEAUX"),
+          ("31000", "TOULOUSE"), ("44000", "NANTES"), ("59000", "LILLE"), ("67000", "STRASBOURG")]
+ASSUREURS = ["AXA", "ALLIANZ", "GENERALI", "MAIF", "MACIF", "GROUPAMA"]
+GESTIONNAIRES = ["Alice Roche", "Bruno Marchand", "Chloé Vidal", None]
+CATEGORIES = ["Constat", "Photos", "Facture", "RIB", "Devis", "Rapport d'expertise"]
+CHECKLISTS = {
+    1: ["Constat amiable", "Photos des dommages", "Permis de conduire", "Carte grise"],
+    2: ["Déclaration de vol", "Dépôt de plainte", "Factures d'achat"],
+    3: ["Photos des dommages", "Devis de réparation", "Rapport d'expertise"],
+    4: ["Facture", "RIB", "Attestation d'assurance"],
+}
+
+
+def build_fixtures(seed: int, count: int) -> dict:
+    """Génère sinistres, assurés, documents et règlements (mêmes données pour un même seed)"""
+    rng = random.Random(seed)
+    today = date(2025, 1, 1)
+    sinistres = {}
+    reglements = []
+
+    for i in range(count):
+        id_sinistre = 221000 + i
+        cp, ville = rng.choice(VILLES)
+        nom, prenom = rng.choice(NOMS), rng.choice(PRENOMS)
+        type_sinistre = rng.randint(1, 4)
+        date_sinistre = today - timedelta(days=rng.randint(1, 700))
+        fraude = 1 if rng.random() < 0.05 else 0
+
+        geds = [{
+            "id_ged": id_sinistre * 10 + j,
+            "filename": f"piece_{j + 1}_{rng.choice(CATEGORIES).lower().replace(' ', '_')}.pdf",
+            "categorie": rng.choice(CATEGORIES),
+            "poids": rng.randint(20_000, 4_000_000),
+            "piece_verifiee": rng.randint(0, 1),
+            "date": str(date_sinistre + timedelta(days=j + 1)),
+        } for j in range(rng.randint(0, 6))]
+
+        for j in range(rng.randint(0, 3)):
+            reglements.append({
+                "id": len(reglements) + 1,
+                "id_sinistre": id_sinistre,
+                "montant": round(rng.uniform(50, 8000), 2),
+                "devise": "EUR",
+                "statut_code": rng.randint(1, 3),
+                "sens_code": rng.randint(1, 2),
+                "destinataire": f"{prenom} {nom}",
+            })
+
+        sinistres[id_sinistre] = {
+            "id": id_sinistre,
+            "ref_assureur": f"E00{25150000 + i}",
+            "ref_courtier": f"C-{id_sinistre}",
+            "ref_sinistre": f"SIM-{id_sinistre}",
+            "statut": 1 if rng.random() < 0.7 else 0,
+            "type_sinistre": type_sinistre,
+            "fraude": fraude,
+            "suspicion_tx": rng.randint(40, 95) if fraude else 0,
+            "mecontent": 1 if rng.random() < 0.08 else 0,
+            "nom_assureur": rng.choice(ASSUREURS),
+            "gestionnaire_nom": rng.choice(GESTIONNAIRES),
+            "date_ouverture": str(date_sinistre + timedelta(days=rng.randint(0, 5))),
+            "assure": {
+                "id": 9000 + i,
+                "nom": nom,
+                "prenom": prenom,
+                "email": f"{prenom.lower()}.{nom.lower()}@example.fr",
+                "tel1": f"06{rng.randint(10000000, 99999999)}",
+            },
+            "sinistre": {
+                "date_sinistre": str(date_sinistre),
+                "heure_sinistre": f"{rng.randint(6, 22):02d}:{rng.choice(['00', '15', '30', '45'])}",
+                "cp_sinistre": cp,
+                "ville_sinistre": ville,
+                "circonstance": "Sinistre simulé pour les tests.",
+            },
+            "taches": [],
+            "ged": geds,
+        }
+
+    return {"sinistres": sinistres, "reglements": reglements}
+
+
+def summary(s: dict) -> dict:
+    """Ligne de sinistre/list (sans le détail)"""
+    keys = ("id", "ref_assureur", "ref_courtier", "ref_sinistre", "statut",
+            "type_sinistre", "fraude", "mecontent", "date_ouverture")
+    return {**{k: s[k] for k in keys}, "assure": {k: s["assure"][k] for k in ("id", "nom", "prenom")}}
+
+
+def fake_pdf(title: str, size: int) -> bytes:
+    """PDF minimal valide, complété par un commentaire jusqu'à `size` octets"""
+    text = f"BT /F1 18 Tf 72 720 Td ({title}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(text), text),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    if len(out) < size:
+        out += b"%" + b"x" * (size - len(out) - 2) + b"\n"
+    return bytes(out)
+
+
+class Simulator:
+    def __init__(self, args):
+        self.token = args.token
+        self.pdf_size = args.pdf_kb * 1024
+        self.rng = random.Random(args.seed)
+        self.defaults = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate}
+        self.profile = {}
+        for endpoint, values in DEFAULT_PROFILE.items():
+            self.profile[endpoint] = values if args.latency_ms is None else {}
+        if args.profile:
+            with open(args.profile) as f:
+                for endpoint, values in json.load(f).items():
+                    self.profile[endpoint] = {**self.profile.get(endpoint, {}), **values}
+
+        fixtures = build_fixtures(args.seed, args.sinistres)
+        self.sinistres = fixtures["sinistres"]
+        self.reglements = fixtures["reglements"]
+        self.next_id = max(self.sinistres, default=221000) + 1
+        self.geds = {d["id_ged"]: (s, d) for s in self.sinistres.values() for d in s["ged"]}
+        self.next_ged = max(self.geds, default=0) + 1
+        self.calls = {}
+        self.errors = {}
+
+        self.handlers = {
+            "sinistre/get": self.sinistre_get,
+            "sinistre/list": self.sinistre_list,
+            "sinistre/add": self.sinistre_add,
+            "sinistre/contact": self.sinistre_contact,
+            "sinistre/cloturer": self.sinistre_cloturer,
+            "sinistre/reglement/list": self.reglement_list,
+            "sinistre/checklist/get": self.checklist_get,
+            "ged/list": self.ged_list,
+            "ged/get": self.ged_get,
+            "ged/add": self.ged_add,
+            "ged/document/get": self.document_get,
+            "assure/update": self.assure_update,
+        }
+
+    def settings(self, endpoint: str) -> dict:
+        values = {"latency_ms": 50, "jitter_ms": 0, "error_rate": 0.0}
+        values.update({k: v for k, v in self.defaults.items() if v is not None})
+        values.update(self.profile.get(endpoint, {}))
+        return values
+
+    # ------------------------------------------------------------------ HTTP
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        endpoint = request.match_info["endpoint"]
+        handler = self.handlers.get(endpoint)
+        if handler is None:
+            return web.json_response({"status": 404, "message": f"Endpoint inconnu: {endpoint}"}, status=404)
+
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        form = await read_form(request)
+
+        settings = self.settings(endpoint)
+        jitter = settings["jitter_ms"]
+        delay = max(settings["latency_ms"] + self.rng.uniform(-jitter, jitter), 0) / 1000
+        await asyncio.sleep(delay)
+
+        if self.token and form.get("token") != self.token:
+            return web.json_response({"status": 401, "message": "Token invalide"}, status=401)
+        if self.rng.random() < settings["error_rate"]:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return web.json_response({"status": 500, "message": "Erreur simulée"}, status=500)
+
+        result = handler(form)
+        if isinstance(result, web.StreamResponse):
+            return result
+        return web.json_response(result)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"calls": self.calls, "errors": self.errors, "sinistres": len(self.sinistres)})
+
+    # ------------------------------------------------------------ endpoints
+
+    def find(self, form: dict):
+        if form.get("id_sinistre"):
+            return self.sinistres.get(int(form["id_sinistre"]))
+        ref = form.get("ref_sinistre")
+        for s in self.sinistres.values():
+            if ref in (s["ref_assureur"], s["ref_courtier"], s["ref_sinistre"]):
+                return s
+        return None
+
+    def sinistre_get(self, form):
+        s = self.find(form)
+        if s is None:
+            return {"status": 500, "message": "Sinistre introuvable"}
+        reglements = [r for r in self.reglements if r["id_sinistre"] == s["id"]]
+        return {"status": 200, "data": {**s, "reglements": reglements}}
+
+    def sinistre_list(self, form):
+        rows = list(self.sinistres.values())
+        if form.get("statut"):
+            rows = [s for s in rows if str(s["statut"]) == form["statut"]]
+        offset = int(form.get("offset") or 0)
+        limit = int(form["limit"]) if form.get("limit") else len(rows)
+        return {"status": 200, "total": len(rows), "data": [summary(s) for s in rows[offset:offset + limit]]}
+
+    def sinistre_add(self, form):
+        id_sinistre = self.next_id
+        self.next_id += 1
+        self.sinistres[id_sinistre] = {
+            "id": id_sinistre,
+            "ref_assureur": form.get("ref_sinistre") or f"SIM-{id_sinistre}",
+            "ref_courtier": f"C-{id_sinistre}",
+            "ref_sinistre": form.get("ref_sinistre") or f"SIM-{id_sinistre}",
+            "statut": 1,
+            "type_sinistre": int(form.get("type_sinistre") or 1),
+            "fraude": 0,
+            "suspicion_tx": 0,
+            "mecontent": 0,
+            "nom_assureur": ASSUREURS[0],
+            "gestionnaire_nom": None,
+            "date_ouverture": str(date.today()),
+            "assure": {
+                "id": 9000 + id_sinistre,
+                "nom": form.get("assure[nom]", "").upper(),
+                "prenom": form.get("assure[prenom]", "").upper(),
+                "email": form.get("assure[email]", ""),
+                "tel1": form.get("assure[tel1]", ""),
+            },
+            "sinistre": {
+                "date_sinistre": form.get("sinistre[date_sinistre]", ""),
+                "cp_sinistre": form.get("sinistre[cp]", ""),
+                "ville_sinistre": form.get("sinistre[ville]", ""),
+                "circonstance": form.get("sinistre[circonstances]", ""),
+            },
+            "taches": [],
+            "ged": [],
+        }
+        s = self.sinistres[id_sinistre]
+        return {"status": 200, "id_sinistre": id_sinistre, "reference": s["ref_sinistre"], "id_assure": s["assure"]["id"]}
+
+    def sinistre_contact(self, form):
+        s = self.find(form)
+        if s is None:
+            return {"status": 500, "message": "Sinistre introuvable"}
+        id_tache = s["id"] * 100 + len(s["taches"]) + 1
+        s["taches"].append({"id_tache": id_tache, "objet": form.get("objet", ""), "type": form.get("type")})
+        return {"status": 200, "id_tache": id_tache}
+
+    def sinistre_cloturer(self, form):
+        s = self.find(form)
+        if s is None:
+            return {"status": 500, "message": "Sinistre introuvable"}
+        s["statut"] = 0
+        return {"status": 200, "id_sinistre": s["id"]}
+
+    def reglement_list(self, form):
+        rows = self.reglements
+        if form.get("status"):
+            rows = [r for r in rows if str(r["statut_code"]) == form["status"]]
+        if form.get("sens"):
+            rows = [r for r in rows if str(r["sens_code"]) == form["sens"]]
+        return {"status": 200, "data": rows[:int(form.get("limit") or 50)]}
+
+    def checklist_get(self, form):
+        s = self.find(form)
+        if s is None:
+            return {"status": 500, "message": "Sinistre introuvable"}
+        pieces = CHECKLISTS.get(s["type_sinistre"], CHECKLISTS[1])
+        return {"status": 200, "data": {"checklist": [{"nom": p, "description": f"{p} (obligatoire)"} for p in pieces]}}
+
+    def ged_list(self, form):
+        s = self.find(form)
+        if s is None:
+            return {"status": 500, "message": "Sinistre introuvable"}
+        return {"status": 200, "data": {"count": len(s["ged"]), "geds": s["ged"]}}
+
+    def ged_get(self, form):
+        found = self.geds.get(int(form.get("id_ged") or 0))
+        if found is None:
+            return {"status": 500, "message": "Document introuvable"}
+        s, doc = found
+        return {"status": 200, "data": {**doc, "id_sinistre": s["id"]}}
+
+    def ged_add(self, form):
+        s = self.find(form)
+        if s is None:
+            return {"status": 500, "message": "Sinistre introuvable"}
+        id_ged = self.next_ged
+        self.next_ged += 1
+        doc = {
+            "id_ged": id_ged,
+            "filename": form.get("filename", "document"),
+            "categorie": "Non classé",
+            "poids": form.get("content_length", 0) * 3 // 4,
+            "piece_verifiee": 0,
+            "date": str(date.today()),
+        }
+        s["ged"].append(doc)
+        self.geds[id_ged] = (s, doc)
+        return {"status": 200, "id_ged": id_ged, "id_assure": s["assure"]["id"]}
+
+    def document_get(self, form):
+        s = self.find(form) if form.get("id_sinistre") else None
+        if form.get("id_sinistre") and s is None:
+            return {"status": 500, "message": "Sinistre introuvable"}
+        title = f"Document type {form.get('id_type')} - sinistre {form.get('id_sinistre', '-')}"
+        return web.Response(body=fake_pdf(title, self.pdf_size), content_type="application/pdf")
+
+    def assure_update(self, form):
+        id_assure = int(form.get("id_assure") or 0)
+        for s in self.sinistres.values():
+            if s["assure"]["id"] == id_assure:
+                s["assure"].update({k: v for k, v in form.items() if k in ("nom", "prenom", "email", "tel1")})
+        return {"status": 200, "id_assure": id_assure}
+
+
+def encoded_length(segment: bytes) -> int:
+    """Longueur après décodage URL (chaque %XX compte pour un caractère)"""
+    return len(segment) - 2 * segment.count(b"%")
+
+
+async def read_form(request: web.Request) -> dict:
+    """
+    Lit un corps x-www-form-urlencoded par morceaux
+
+    La valeur de 'content' (fichier en base64, éventuellement très gros) n'est
+    pas conservée : seule sa longueur (base64) est gardée dans 'content_length'.
+    """
+    form = {}
+    pending = b""
+    content_length = 0
+    in_content = False
+
+    async for chunk in request.content.iter_chunked(64 * 1024):
+        if in_content:
+            end = chunk.find(b"&")
+            if end < 0:
+                content_length += encoded_length(chunk)
+                continue
+            content_length += encoded_length(chunk[:end])
+            chunk = chunk[end + 1:]
+            in_content = False
+        pending += chunk
+        while True:
+            if pending.startswith(b"content="):
+                end = pending.find(b"&")
+                if end < 0:
+                    content_length += encoded_length(pending[len(b"content="):])
+                    pending = b""
+                    in_content = True
+                    break
+                content_length += encoded_length(pending[len(b"content="):end])
+                pending = pending[end + 1:]
+                continue
+            end = pending.find(b"&")
+            if end < 0:
+                break
+            field, pending = pending[:end], pending[end + 1:]
+            key, _, value = field.decode().partition("=")
+            form[unquote_plus(key)] = unquote_plus(value)
+
+    if pending:
+        key, _, value = pending.decode().partition("=")
+        form[unquote_plus(key)] = unquote_plus(value)
+    if content_length:
+        form["content_length"] = content_length
+    return form
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--seed", type=int, default=42, help="Graine des données générées")
+    parser.add_argument("--sinistres", type=int, default=500, help="Nombre de sinistres générés")
+    parser.add_argument("--latency-ms", type=float, default=None,
+                        help="Latence de tous les endpoints (remplace le profil par défaut)")
+    parser.add_argument("--jitter-ms", type=float, default=None, help="Gigue uniforme ± (ms)")
+    parser.add_argument("--error-rate", type=float, default=None, help="Part des appels en erreur 500 (0-1)")
+    parser.add_argument("--profile", help="JSON : réglages par endpoint (latency_ms, jitter_ms, error_rate)")
+    parser.add_argument("--pdf-kb", type=int, default=200, help="Taille des PDF de ged/document/get (Ko)")
+    parser.add_argument("--token", default="", help="Token exigé (vide : non vérifié)")
+    args = parser.parse_args()
+
+    simulator = Simulator(args)
+    app = web.Application()
+    app.router.add_post("/api/v2/{endpoint:.+}", simulator.handle)
+    app.router.add_get("/_stats", simulator.stats)
+
+    print(f"Simulateur Sydia : http://{args.host}:{args.port} ({len(simulator.sinistres)} sinistres, seed {args.seed})")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
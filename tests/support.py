@@ -0,0 +1,67 @@
+"""
+Outils communs aux tests : configuration isolée et API Sydia simulée
+
+À importer avant app : la configuration est lue à l'import du module.
+Lancer les tests :
+    pipenv run python -m unittest discover tests
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import inspect
+from urllib.parse import parse_qsl
+
+os.environ.update({
+    "SYDIA_API_URL": "http://sydia.test",
+    "SYDIA_MIRROR_PATH": "",
+    "PREFETCH_ENABLED": "0",
+    "LOG_LEVEL": "WARNING",
+    "DOCUMENT_CACHE_DIR": tempfile.mkdtemp(prefix="sydia-tests-"),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import app  # noqa: E402
+
+
+class FakeSydia:
+    """
+    API Sydia en mémoire : un handler par endpoint, appels journalisés
+
+    handlers : {endpoint: fonction(data) -> réponse JSON}, la fonction peut
+    être une coroutine (latence simulée).
+    """
+
+    def __init__(self, handlers: dict):
+        self.handlers = handlers
+        self.calls = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.split("/api/v2/", 1)[1]
+        data = dict(parse_qsl((await request.aread()).decode()))
+        data.pop("token", None)
+        self.calls.append((endpoint, data))
+        result = self.handlers[endpoint](data)
+        if inspect.isawaitable(result):
+            result = await result
+        return httpx.Response(200, json=result)
+
+    def count(self, endpoint: str) -> int:
+        return sum(1 for e, _ in self.calls if e == endpoint)
+
+    def install(self):
+        """Branche ce faux Sydia sur la boucle courante"""
+        app._sydia_clients[asyncio.get_running_loop()] = httpx.AsyncClient(transport=httpx.MockTransport(self))
+
+
+def reset_state():
+    """Vide les caches partagés entre deux tests"""
+    app.sinistre_cache.clear()
+    app.prefetch_cache.clear()
+    app.sinistre_index.clear()
+    app._sydia_inflight.clear()
+    app.sydia_paginates = None
+    app.stats_cache = app.StaleWhileRevalidate(app.compute_stats, app.STATS_TTL, app.STATS_MAX_STALE)
@@ -0,0 +1,87 @@
+import json
+import asyncio
+import unittest
+from unittest import mock
+
+from support import FakeSydia, app, reset_state
+
+
+class ChatBudgetTest(unittest.IsolatedAsyncioTestCase):
+    """Un modèle qui demande toujours des outils doit quand même finir par répondre"""
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.calls = []
+        self.latency = 0
+        for patcher in (
+            mock.patch.object(app, "conversations", app.ConversationStore(10, 3600, 1 << 20)),
+            mock.patch.object(app, "get_azure_client", lambda: None),
+            mock.patch.object(app, "complete", self.complete),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        FakeSydia({"sinistre/get": self.sinistre}).install()
+
+    async def sinistre(self, data):
+        await asyncio.sleep(self.latency)
+        return {"status": 200, "data": {"id": int(data["id_sinistre"]), "statut": 1}}
+
+    async def complete(self, llm, messages, on_delta=None, **kwargs):
+        self.calls.append(kwargs)
+        n = len(self.calls)
+        arguments = json.dumps({"id_sinistre": n})
+        return {"role": "assistant", "content": "Réponse", "tool_calls": [
+            {"id": f"call_{n}", "type": "function", "function": {"name": "get_sinistre", "arguments": arguments}}
+        ]}
+
+    async def test_nombre_de_rounds_borne(self):
+        stats, rounds = {}, []
+        with mock.patch.object(app, "CHAT_MAX_TOOL_ROUNDS", 3):
+            content = await app.chat("s1", "Bonjour", stats=stats, on_tool_round=rounds.append)
+        self.assertEqual(content, "Réponse")
+        self.assertEqual(stats["rounds"], 3)
+        self.assertEqual(rounds, [1, 2, 3])
+        self.assertEqual(len(self.calls), 4)
+        self.assertTrue(all("tools" in kwargs for kwargs in self.calls[:3]))
+        self.assertNotIn("tools", self.calls[-1])
+        self.assertTrue(stats["budget_exhausted"])
+        # La réponse finale est enregistrée sans tool_calls non exécutés
+        self.assertEqual(app.get_messages("s1")[-1], {"role": "assistant", "content": "Réponse"})
+
+    async def test_budget_temps_epuise_des_le_depart(self):
+        stats = {}
+        with mock.patch.object(app, "CHAT_TURN_BUDGET", 0):
+            await app.chat("s1", "Bonjour", stats=stats)
+        self.assertEqual(stats["rounds"], 0)
+        self.assertEqual(len(self.calls), 1)
+        self.assertNotIn("tools", self.calls[0])
+        self.assertTrue(stats["budget_exhausted"])
+
+    async def test_budget_temps_epuise_apres_un_outil_lent(self):
+        stats = {}
+        self.latency = 0.1
+        with mock.patch.object(app, "CHAT_TURN_BUDGET", 0.05):
+            await app.chat("s1", "Bonjour", stats=stats)
+        self.assertEqual(stats["rounds"], 1)
+        self.assertEqual(len(self.calls), 2)
+        self.assertIn("tools", self.calls[0])
+        self.assertNotIn("tools", self.calls[1])
+        self.assertTrue(stats["budget_exhausted"])
+
+    async def test_budget_non_atteint(self):
+        stats = {}
+        first = self.complete
+
+        async def complete(llm, messages, on_delta=None, **kwargs):
+            if self.calls:
+                return {"role": "assistant", "content": "Fini"}
+            return await first(llm, messages, on_delta, **kwargs)
+
+        with mock.patch.object(app, "complete", complete):
+            self.assertEqual(await app.chat("s1", "Bonjour", stats=stats), "Fini")
+        self.assertEqual(stats["rounds"], 1)
+        self.assertNotIn("budget_exhausted", stats)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from support import FakeSydia, app, reset_state
+
+
+def index(*filenames, categorie=""):
+    return app.build_document_index([{"filename": f, "categorie": categorie} for f in filenames])
+
+
+class PieceFournieTest(unittest.TestCase):
+
+    def test_prefixe_de_mot(self):
+        self.assertTrue(app.piece_fournie("Facture d'achat", index("factures_2023.pdf")))
+        self.assertTrue(app.piece_fournie("Photos", index("PHOTOS-Dommages.JPG")))
+
+    def test_accents_et_casse(self):
+        self.assertTrue(app.piece_fournie("Relevé d'identité bancaire", index("RELEVE_BANQUE.pdf")))
+        self.assertTrue(app.piece_fournie("Procès-verbal", index("scan.pdf", categorie="PROCES VERBAL")))
+
+    def test_mots_vides_ignores(self):
+        self.assertFalse(app.piece_fournie("Photos des dommages", index("devis des travaux.pdf")))
+        self.assertFalse(app.piece_fournie("Copie de la carte grise", index("le_permis.pdf")))
+        self.assertTrue(app.piece_fournie("Copie de la carte grise", index("carte_grise.pdf")))
+
+    def test_nom_court_compare_en_entier(self):
+        self.assertTrue(app.piece_fournie("PV", index("pv_police.pdf")))
+        self.assertFalse(app.piece_fournie("PV", index("rapport.pdf")))
+        self.assertFalse(app.piece_fournie("Facture", index()))
+
+
+class VerifierChecklistTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.sydia = FakeSydia({
+            "sinistre/get": lambda data: {"status": 200, "data": {"id": 5, "ref_assureur": "R5", "statut": 1}},
+            "sinistre/checklist/get": lambda data: {"status": 200, "data": {"checklist": [
+                {"nom": "Facture d'achat", "description": "Preuve de valeur"},
+                {"nom": "Photos des dommages", "description": "Vue d'ensemble"},
+                {"nom": "Constat amiable", "description": "Signé des deux parties"},
+            ]}},
+            "ged/list": lambda data: {"status": 200, "data": {"count": 2, "geds": [
+                {"filename": "factures_2023.pdf", "categorie": ""},
+                {"filename": "devis des travaux.pdf", "categorie": "Devis"},
+            ]}},
+        })
+        self.sydia.install()
+
+    async def test_pieces_fournies_et_manquantes(self):
+        result = await app.execute_tool("verifier_checklist", {"ref_sinistre": "R5"})
+        fournies, manquantes = result.split("**Pièces manquantes :**")
+
+        self.assertIn("✅ **Facture d'achat**", fournies)
+        self.assertIn("❌ **Photos des dommages**", manquantes)
+        self.assertIn("❌ **Constat amiable**", manquantes)
+        self.assertIn("2 pièce(s) manquante(s)** (1/3 pièces)", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
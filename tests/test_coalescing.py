@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from support import FakeSydia, app, reset_state
+
+
+class CoalescingTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.release = asyncio.Event()
+        self.statut = 1
+        self.sydia = FakeSydia({
+            "sinistre/get": self.lent,
+            "sinistre/cloturer": self.cloturer,
+            "ged/add": lambda data: {"status": 200, "id_ged": 1},
+        })
+        self.sydia.install()
+
+    async def lent(self, data):
+        statut = self.statut  # état lu à l'arrivée de la requête
+        await self.release.wait()
+        return {"status": 200, "data": {"id": int(data["id_sinistre"]), "statut": statut}}
+
+    def cloturer(self, data):
+        self.statut = 0
+        return {"status": 200, "id_sinistre": int(data["id_sinistre"])}
+
+    def get(self, id_sinistre=5):
+        return asyncio.ensure_future(app.sydia_call("sinistre/get", {"id_sinistre": str(id_sinistre)}))
+
+    async def test_appels_identiques_fusionnes(self):
+        calls = [self.get() for _ in range(5)] + [self.get(6)]
+        await asyncio.sleep(0.01)
+        self.release.set()
+        results = await asyncio.gather(*calls)
+
+        self.assertEqual(self.sydia.count("sinistre/get"), 2)
+        self.assertTrue(all(r is results[0] for r in results[:5]))
+        self.assertEqual(app._sydia_inflight, {})
+
+    async def test_annulation_d_un_appelant(self):
+        first, second = self.get(), self.get()
+        await asyncio.sleep(0.01)
+        first.cancel()
+        self.release.set()
+
+        self.assertEqual((await second)["data"]["id"], 5)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.sydia.count("sinistre/get"), 1)
+
+    async def test_lecture_apres_ecriture_non_fusionnee(self):
+        before = self.get()
+        await asyncio.sleep(0.01)
+        await app.sydia_call("sinistre/cloturer", {"id_sinistre": "5"})
+        after = self.get()
+        await asyncio.sleep(0.01)
+        self.release.set()
+
+        self.assertEqual((await before)["data"]["statut"], 1)
+        self.assertEqual((await after)["data"]["statut"], 0)
+        self.assertEqual(self.sydia.count("sinistre/get"), 2)
+
+    async def test_envoi_de_document_compte_comme_ecriture(self):
+        before = self.get()
+        await asyncio.sleep(0.01)
+        await app.add_document(5, "note.txt", content=b"texte")
+        after = self.get()
+        self.release.set()
+        await asyncio.gather(before, after)
+        self.assertEqual(self.sydia.count("sinistre/get"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
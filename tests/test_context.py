@@ -0,0 +1,84 @@
+import unittest
+from unittest import mock
+
+from support import app
+
+
+def turn(i: int, result_size: int = 2000) -> list:
+    """Un tour : question, appel d'outil, résultat volumineux, réponse"""
+    return [
+        {"role": "user", "content": f"Question {i}"},
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": f"call_{i}", "type": "function", "function": {"name": "get_sinistre", "arguments": "{}"}}
+        ]},
+        {"role": "tool", "tool_call_id": f"call_{i}", "content": f"✅ Sinistre {i}\n" + "x" * result_size},
+        {"role": "assistant", "content": f"Réponse {i}"},
+    ]
+
+
+def history(turns: int) -> list:
+    messages = [{"role": "system", "content": "prompt"}]
+    for i in range(turns):
+        messages += turn(i)
+    return messages
+
+
+class BuildContextTest(unittest.TestCase):
+
+    def assert_pairs_intact(self, context: list):
+        """Chaque résultat d'outil suit son appel, chaque appel a son résultat"""
+        called = set()
+        answered = set()
+        for m in context:
+            for tc in m.get("tool_calls") or ():
+                called.add(tc["id"])
+            if m["role"] == "tool":
+                self.assertIn(m["tool_call_id"], called, "résultat d'outil sans son appel")
+                answered.add(m["tool_call_id"])
+        self.assertEqual(called, answered, "appel d'outil sans son résultat")
+
+    def test_historique_court_inchange(self):
+        messages = history(2)
+        context, saved = app.build_context(messages)
+        self.assertEqual(context, messages)
+        self.assertEqual(saved, 0)
+
+    def test_anciens_resultats_resumes(self):
+        messages = history(6)
+        with mock.patch.object(app, "CONTEXT_TOKEN_BUDGET", 100_000), mock.patch.object(app, "CONTEXT_KEEP_TURNS", 2):
+            context, saved = app.build_context(messages)
+
+        self.assertEqual(len(context), len(messages))
+        tools = [m for m in context if m["role"] == "tool"]
+        self.assertTrue(all("omise" in m["content"] for m in tools[:4]))
+        self.assertEqual(tools[4:], [m for m in messages if m["role"] == "tool"][4:])
+        self.assertGreater(saved, 0)
+        self.assert_pairs_intact(context)
+
+    def test_tours_retires_entiers_sous_budget(self):
+        messages = history(20)
+        with mock.patch.object(app, "CONTEXT_TOKEN_BUDGET", 2000), mock.patch.object(app, "CONTEXT_KEEP_TURNS", 3):
+            context, _ = app.build_context(messages)
+
+        self.assertEqual(context[0], messages[0])
+        self.assertEqual(context[-12:], messages[-12:])  # 3 derniers tours intacts
+        self.assertLess(len(context), len(messages))
+        self.assertEqual(context[1]["role"], "user")  # coupure sur une frontière de tour
+        self.assert_pairs_intact(context)
+
+    def test_tours_recents_gardes_meme_hors_budget(self):
+        messages = history(3)
+        with mock.patch.object(app, "CONTEXT_TOKEN_BUDGET", 10):
+            context, _ = app.build_context(messages)
+        self.assertEqual(context, messages)
+
+    def test_historique_stocke_non_modifie(self):
+        messages = history(10)
+        snapshot = [dict(m) for m in messages]
+        with mock.patch.object(app, "CONTEXT_TOKEN_BUDGET", 500):
+            app.build_context(messages)
+        self.assertEqual(messages, snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
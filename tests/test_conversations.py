@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+
+from support import app, reset_state
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ConversationStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(app.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lru(self):
+        store = app.ConversationStore(max_sessions=2, idle_ttl=3600, max_bytes=1 << 20)
+        store.get("a")
+        store.get("b")
+        store.get("a")  # a redevient la plus récente
+        store.get("c")
+        self.assertIn("a", store)
+        self.assertNotIn("b", store)
+        self.assertIn("c", store)
+        self.assertEqual(store.stats()["evictions"], 1)
+
+    def test_expiration_inactivite(self):
+        store = app.ConversationStore(max_sessions=10, idle_ttl=60, max_bytes=1 << 20)
+        store.get("a")
+        self.clock.now += 30
+        store.get("b")
+        self.clock.now += 45  # a inactive depuis 75 s, b depuis 45 s
+        self.assertEqual(store.stats()["sessions"], 1)
+        self.assertNotIn("a", store)
+        self.assertIn("b", store)
+
+    def test_limite_en_octets(self):
+        empty = app.estimate_size([{"role": "system", "content": app.SYSTEM_PROMPT}])
+        limit = 3 * empty + 100
+        store = app.ConversationStore(max_sessions=10, idle_ttl=3600, max_bytes=limit)
+        store.get("a")
+        store.get("b")
+        messages = store.get("c")
+        self.assertEqual(len(store), 3)
+        messages.append({"role": "user", "content": "x" * empty})
+        store.touch("c", messages)
+        self.assertNotIn("a", store)
+        self.assertIn("b", store)
+        self.assertIn("c", store)
+        self.assertLessEqual(store.total_bytes, limit)
+        self.assertEqual(store.total_bytes, sum(app.estimate_size(store.get(s)) for s in ("b", "c")))
+
+        # Une session trop grosse à elle seule est conservée
+        messages.append({"role": "user", "content": "x" * limit})
+        store.touch("c", messages)
+        self.assertEqual(len(store), 1)
+        self.assertIn("c", store)
+        self.assertEqual(store.total_bytes, app.estimate_size(messages))
+
+    def test_session_evincee_pendant_son_tour(self):
+        store = app.ConversationStore(max_sessions=1, idle_ttl=3600, max_bytes=1 << 20)
+        messages = store.get("a")
+        messages.append({"role": "user", "content": "Bonjour"})
+        store.get("b")  # évince a
+        self.assertNotIn("a", store)
+        messages.append({"role": "assistant", "content": "Réponse"})
+        store.touch("a", messages)
+        self.assertIs(store.get("a"), messages)
+        self.assertEqual(store.total_bytes, app.estimate_size(messages))
+
+
+class ChatEvictionTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.store = app.ConversationStore(max_sessions=1, idle_ttl=3600, max_bytes=1 << 20)
+        for patcher in (
+            mock.patch.object(app, "conversations", self.store),
+            mock.patch.object(app, "get_azure_client", lambda: None),
+            mock.patch.object(app, "complete", self.complete),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def complete(self, llm, messages, on_delta=None, **kwargs):
+        app.get_messages("autre")  # une autre session évince celle du tour
+        return {"role": "assistant", "content": "Réponse"}
+
+    async def test_tour_conserve(self):
+        await app.chat("s1", "Bonjour", stats={})
+        self.assertIn("s1", self.store)
+        self.assertEqual(
+            [m["content"] for m in app.get_messages("s1")[1:]],
+            ["Bonjour", "Réponse"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import json
+import base64
+import tempfile
+import unittest
+from unittest import mock
+
+from support import FakeSydia, app, reset_state
+
+
+PDF = b"%PDF-1.4\n" + os.urandom(5000) + b"\n%%EOF"
+
+
+class DocumentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = app.DocumentCache(self.tmp.name, max_bytes=10**7, max_age=60)
+
+    def store(self, key, id_sinistre=None, id_assure=None) -> dict:
+        spool = self.cache.spool()
+        spool.write(PDF)
+        return self.cache.commit(key, spool, "doc.pdf", id_sinistre, id_assure)
+
+    def test_expire_apres_max_age(self):
+        self.store("k")
+        self.assertIsNotNone(self.cache.get("k"))
+        with mock.patch.object(app.time, "time", return_value=app.time.time() + 61):
+            self.assertIsNone(self.cache.get("k"))
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_invalidation_par_sinistre_et_par_assure(self):
+        self.store("sinistre", id_sinistre=5)
+        self.store("assure", id_assure=9)
+        self.store("autre", id_sinistre=6, id_assure=8)
+
+        self.cache.invalidate(id_assure=9)
+        self.assertIsNone(self.cache.get("assure"))
+        self.cache.invalidate(id_sinistre=5)
+        self.assertIsNone(self.cache.get("sinistre"))
+        self.assertIsNotNone(self.cache.get("autre"))
+
+    def test_index_relu_sur_disque(self):
+        self.store("k", id_assure=9)
+        cache = app.DocumentCache(self.tmp.name, max_bytes=10**7, max_age=60)
+        cache.invalidate(id_assure=9)
+        self.assertIsNone(cache.get("k"))
+
+
+class Base64FieldTest(unittest.TestCase):
+
+    def decode(self, body: bytes, size: int):
+        out = bytearray()
+        field = app.Base64Field("content", out.extend)
+        for i in range(0, len(body), size):
+            field.feed(body[i:i + size])
+        return bytes(out), json.loads(field.rest), field.invalid
+
+    def test_decoupage_quelconque(self):
+        encoded = json.dumps(base64.b64encode(PDF).decode()).replace("/", "\\/")  # comme json_encode en PHP
+        body = ('{"message": "\\"content\\": piège", "filename": "a.pdf", "content": ' + encoded
+                + ', "meta": {"content": 1}, "size": 5}').encode()
+        for size in (1, 2, 3, 7, 4096, len(body)):
+            content, rest, invalid = self.decode(body, size)
+            self.assertEqual(content, PDF)
+            self.assertFalse(invalid)
+            self.assertEqual(rest, {"message": '"content": piège', "filename": "a.pdf", "content": "",
+                                    "meta": {"content": 1}, "size": 5})
+
+    def test_base64_invalide(self):
+        _, rest, invalid = self.decode(b'{"filename": "a.pdf", "content": "pas du base64 !"}', 5)
+        self.assertTrue(invalid)
+        self.assertEqual(rest["filename"], "a.pdf")
+
+
+class GenerateDocumentTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(app, "document_cache", app.DocumentCache(self.tmp.name, 10**7, 60))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sydia = FakeSydia({"ged/document/get": lambda data: {
+            "filename": "attestation.pdf", "content": base64.b64encode(PDF).decode()
+        }})
+        self.sydia.install()
+
+    async def test_document_servi_puis_invalide_par_assure(self):
+        result = await app.generate_document(3, id_assure=9)
+        self.assertFalse(result["cached"])
+        with open(app.document_cache.path(result["sha256"]), "rb") as f:
+            self.assertEqual(f.read(), PDF)
+
+        self.assertTrue((await app.generate_document(3, id_assure=9))["cached"])
+        app.invalidate_sinistre(id_assure=9)
+        self.assertFalse((await app.generate_document(3, id_assure=9))["cached"])
+        self.assertEqual(self.sydia.count("ged/document/get"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
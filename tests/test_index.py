@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from support import FakeSydia, app, reset_state
+
+
+class SinistreIndexTest(unittest.TestCase):
+
+    def test_statut_expire(self):
+        index = app.SinistreIndex(10, statut_ttl=60)
+        index.add({"id": 1, "ref_assureur": "R1", "statut": 1})
+        self.assertEqual(index.get("R1"), (1, None, 1))
+
+        with mock.patch.object(app.time, "monotonic", return_value=app.time.monotonic() + 61):
+            self.assertEqual(index.get("R1"), (1, None, None))
+
+    def test_statut_oublie_par_assure(self):
+        index = app.SinistreIndex(10, statut_ttl=60)
+        index.add({"id": 1, "ref_assureur": "R1", "statut": 1, "assure": {"id": 9}})
+        index.add({"id": 2, "ref_assureur": "R2", "ref_courtier": "C2", "statut": 1, "assure": {"id": 9}})
+        index.add({"id": 3, "ref_assureur": "R3", "statut": 1, "assure": {"id": 8}})
+
+        index.forget_statut(id_assure=9)
+        self.assertEqual([index.get(r)[2] for r in ("R1", "R2", "C2", "R3")], [None, None, None, 1])
+
+    def test_eviction_coherente(self):
+        index = app.SinistreIndex(2, statut_ttl=60)
+        index.add({"id": 1, "ref_assureur": "R1", "statut": 1, "assure": {"id": 9}})
+        index.add({"id": 2, "ref_assureur": "R2", "statut": 1, "assure": {"id": 9}})
+        index.add({"id": 3, "ref_assureur": "R3", "statut": 1, "assure": {"id": 9}})
+
+        self.assertIsNone(index.get("R1"))
+        self.assertEqual(index.refs(1), set())
+        index.forget_statut(id_assure=9)
+        self.assertEqual(index.get("R3"), (3, 9, None))
+
+    def test_reference_reattribuee(self):
+        index = app.SinistreIndex(10, statut_ttl=60)
+        index.add({"id": 1, "ref_assureur": "R1", "statut": 1})
+        index.add({"id": 2, "ref_assureur": "R1", "statut": 1})
+        self.assertEqual(index.refs(1), set())
+        self.assertEqual(index.refs(2), {"R1"})
+
+
+class ClotureGuardTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.statut = 1
+        self.sydia = FakeSydia({
+            "sinistre/list": lambda data: {"status": 200, "data": [{"id": 5, "ref_assureur": "R5", "statut": 1}]},
+            "sinistre/get": lambda data: {"status": 200, "data": {
+                "id": 5, "ref_assureur": "R5", "statut": self.statut, "assure": {"id": 9}
+            }},
+            "sinistre/cloturer": lambda data: {"status": 200, "id_sinistre": 5},
+        })
+        self.sydia.install()
+        patcher = mock.patch.object(app, "notify_refresh")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def cloturer(self) -> str:
+        return await app.execute_tool("cloturer_sinistre", {"ref_sinistre": "R5", "raison": 21})
+
+    async def test_statut_recent_de_l_index_utilise(self):
+        await app.list_sinistres(limit=10, use_mirror=False)
+        await self.cloturer()
+        self.assertEqual(self.sydia.count("sinistre/get"), 0)
+        self.assertEqual(self.sydia.count("sinistre/cloturer"), 1)
+
+    async def test_cloture_externe_detectee_apres_ttl(self):
+        await app.list_sinistres(limit=10, use_mirror=False)
+        self.statut = 0  # clôturé hors de l'agent
+
+        with mock.patch.object(app.sinistre_index, "statut_ttl", 0):
+            result = await self.cloturer()
+
+        self.assertIn("déjà clôturé", result)
+        self.assertEqual(self.sydia.count("sinistre/cloturer"), 0)
+
+    async def test_statut_oublie_apres_cloture(self):
+        await app.list_sinistres(limit=10, use_mirror=False)
+        await self.cloturer()
+        self.assertIsNone(app.sinistre_index.get("R5")[2])
+
+        self.statut = 0
+        self.assertIn("déjà clôturé", await self.cloturer())
+        self.assertEqual(self.sydia.count("sinistre/cloturer"), 1)
+
+    async def test_statut_du_miroir_non_utilise(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mirror = app.SinistreMirror(os.path.join(tmp, "mirror.db"))
+            mirror.store_detail({"id": 5, "ref_assureur": "R5", "statut": 1, "assure": {"id": 9}})
+            self.statut = 0
+            with mock.patch.object(app, "sinistre_mirror", mirror):
+                self.assertIn("déjà clôturé", await self.cloturer())
+        self.assertEqual(self.sydia.count("sinistre/get"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
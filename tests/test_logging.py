@@ -0,0 +1,56 @@
+import queue
+import logging
+import logging.handlers
+import threading
+import unittest
+
+from support import app
+
+
+class RenderedIn(app.Payload):
+    """Payload qui note le thread où il est rendu"""
+
+    threads = []
+
+    def __str__(self) -> str:
+        self.threads.append(threading.current_thread())
+        return super().__str__()
+
+
+class DeferredQueueHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = queue.SimpleQueue()
+        self.logger = logging.Logger("sydia.test")  # hors hiérarchie : pas d'autre handler
+        self.logger.addHandler(app.DeferredQueueHandler(self.queue))
+        RenderedIn.threads.clear()
+
+    def test_enregistrement_non_formate(self):
+        payload = RenderedIn({"token": "secret"})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            self.logger.error("réponse: %s", payload, exc_info=True)
+
+        record = self.queue.get_nowait()
+        self.assertEqual(record.msg, "réponse: %s")
+        self.assertIs(record.args[0], payload)
+        self.assertIs(record.exc_info[0], ValueError)
+        self.assertEqual(RenderedIn.threads, [])
+
+    def test_formate_par_le_listener(self):
+        lines = []
+        handler = logging.Handler()
+        handler.emit = lambda record: lines.append(app.StructuredFormatter().format(record))
+        listener = logging.handlers.QueueListener(self.queue, handler)
+        listener.start()
+        self.logger.warning("réponse: %s", RenderedIn({"token": "secret"}))
+        listener.stop()
+
+        self.assertIn("réponse: {'token': '***'}", lines[0])
+        self.assertEqual(len(RenderedIn.threads), 1)
+        self.assertIsNot(RenderedIn.threads[0], threading.current_thread())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import re
+import json
+import unittest
+from unittest import mock
+
+from support import app
+
+_LINE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+_LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+
+
+def parse(text: str) -> dict:
+    """Exposition texte Prometheus → {(nom, labels triés): valeur}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _LINE_RE.match(line)
+        assert match, f"ligne invalide: {line!r}"
+        name, labels, value = match.groups()
+        pairs = []
+        for key, raw in _LABEL_RE.findall(labels or ""):
+            pairs.append((key, re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), raw)))
+        samples[(name, tuple(sorted(pairs)))] = float(value)
+    return samples
+
+
+class MetricsTest(unittest.TestCase):
+
+    def metric(self, cls, *args, **kwargs):
+        metric = cls(*args, **kwargs)
+        self.addCleanup(app.METRICS.remove, metric)
+        return metric
+
+    def scrape(self) -> dict:
+        response = app.app.test_client().get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        return parse(response.get_data(as_text=True))
+
+    def test_histogramme_cumulatif(self):
+        histogram = self.metric(app.Histogram, "test_seconds", "Test", ("endpoint",), buckets=(0.01, 0.1, 1))
+        for value in (0.003, 0.02, 0.02, 0.5, 7):
+            histogram.observe(value, endpoint="a")
+        histogram.observe(0.05, endpoint="b")
+
+        samples = self.scrape()
+        buckets = [samples[("test_seconds_bucket", (("endpoint", "a"), ("le", le)))]
+                   for le in ("0.01", "0.1", "1", "+Inf")]
+        self.assertEqual(buckets, [1, 3, 4, 5])
+        self.assertEqual(samples[("test_seconds_count", (("endpoint", "a"),))], 5)
+        self.assertAlmostEqual(samples[("test_seconds_sum", (("endpoint", "a"),))], 7.543)
+        self.assertEqual(samples[("test_seconds_bucket", (("endpoint", "b"), ("le", "+Inf")))],
+                         samples[("test_seconds_count", (("endpoint", "b"),))])
+
+    def test_echappement_des_labels(self):
+        counter = self.metric(app.Counter, "test_total", "Test", ("endpoint",))
+        valeur = 'a"b\\c\nd'
+        counter.inc(endpoint=valeur)
+        counter.inc(2, endpoint=valeur)
+        self.assertEqual(self.scrape()[("test_total", (("endpoint", valeur),))], 3)
+
+
+class ToolOutcomeTest(unittest.IsolatedAsyncioTestCase):
+
+    async def fake_tool(self, name, arguments):
+        if name == "panne":
+            raise RuntimeError("boom")
+        return "❌ refusé" if name == "refus" else "✅ fait"
+
+    def count(self, samples: dict, tool: str, outcome: str) -> float:
+        return samples.get(("tool_duration_seconds_count", (("outcome", outcome), ("tool", tool))), 0)
+
+    async def test_labels_de_resultat(self):
+        before = parse(app.render_metrics())
+        calls = [{"id": f"c{i}", "type": "function", "function": {"name": n, "arguments": json.dumps({})}}
+                 for i, n in enumerate(("succes", "refus", "panne"))]
+        with mock.patch.object(app, "execute_tool", self.fake_tool), self.assertRaises(RuntimeError):
+            await app.execute_tool_calls(calls)
+
+        after = parse(app.render_metrics())
+        for tool, outcome in (("succes", "ok"), ("refus", "error"), ("panne", "exception")):
+            self.assertEqual(self.count(after, tool, outcome) - self.count(before, tool, outcome), 1, tool)
+
+
+if __name__ == "__main__":
+    unittest.main()
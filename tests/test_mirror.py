@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from support import FakeSydia, app, reset_state
+
+
+class MirrorTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mirror = app.SinistreMirror(os.path.join(self.tmp.name, "mirror.db"))
+        patcher = mock.patch.object(app, "sinistre_mirror", self.mirror)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+        # Sydia renvoie les sinistres du plus récent au plus ancien
+        self.sinistres = [{"id": i, "ref_assureur": f"R{i}", "statut": 1} for i in (30, 20, 10)]
+        self.sydia = FakeSydia({
+            "sinistre/list": lambda data: {"status": 200, "data": list(self.sinistres)},
+            "sinistre/cloturer": self.cloturer,
+            "sinistre/add": lambda data: {"status": 200, "id_sinistre": 40},
+            "sinistre/get": lambda data: {"status": 200, "data": {
+                "id": int(data["id_sinistre"]), "ref_assureur": f"R{data['id_sinistre']}", "statut": 1
+            }},
+            "ged/add": lambda data: {"status": 200, "id_ged": 1},
+            "sinistre/contact": lambda data: {"status": 200, "id_tache": 1},
+        })
+        self.sydia.install()
+
+    def cloturer(self, data):
+        self.sinistres = [{**s, "statut": 0} if str(s["id"]) == data["id_sinistre"] else s for s in self.sinistres]
+        return {"status": 200, "id_sinistre": int(data["id_sinistre"])}
+
+    async def test_lectures_servies_par_le_miroir(self):
+        await app.sync_mirror()
+        self.sydia.calls.clear()
+
+        self.assertEqual(await app.count_sinistres(), {"success": True, "total": 3, "open": 3, "closed": 0})
+        result = await app.list_sinistres(limit=2)
+        self.assertEqual([s["id"] for s in result["data"]], [30, 20])
+        self.assertEqual(self.sydia.calls, [])
+
+    async def test_cloture_met_a_jour_la_ligne(self):
+        await app.sync_mirror()
+        self.sydia.calls.clear()
+        await app.cloturer_sinistre(id_sinistre=20, date_fermeture="2026-01-01", raison=1)
+
+        self.assertTrue(app.mirror_list_fresh())
+        self.assertEqual(await app.count_sinistres(), {"success": True, "total": 3, "open": 2, "closed": 1})
+        result = await app.list_sinistres(limit=10)
+        self.assertEqual([s["statut"] for s in result["data"]], [1, 0, 1])
+        self.assertEqual(self.sydia.count("sinistre/list"), 0)
+
+    async def test_document_et_contact_sans_effet_sur_la_liste(self):
+        await app.sync_mirror()
+        self.sydia.calls.clear()
+        await app.add_document(20, "note.txt", content=b"texte")
+        await app.contact_gestionnaire(20, 2, "Question")
+
+        self.assertTrue(app.mirror_list_fresh())
+        self.assertEqual(await app.count_sinistres(), {"success": True, "total": 3, "open": 3, "closed": 0})
+        self.assertEqual(self.sydia.count("sinistre/list"), 0)
+
+    async def test_declaration_ajoutee_en_tete(self):
+        await app.sync_mirror()
+        self.sinistres.insert(0, {"id": 40, "ref_assureur": "R40", "statut": 1})
+        result = await app.add_sinistre(1, "2026-01-01", "Paris", "75001", "Choc", "NOM", "Prenom", "a@b.fr", "0600000000")
+        self.assertTrue(result["success"])
+
+        self.assertEqual([s["id"] for s in self.mirror.list_page()], [40, 30, 20, 10])
+        self.assertEqual(self.mirror.counts()["total"], 4)
+
+    async def test_ecriture_pendant_la_synchronisation(self):
+        await app.sync_mirror()
+        generation = self.mirror.generation
+        perimees = [dict(s) for s in self.sinistres]  # pages lues avant la clôture
+        await app.cloturer_sinistre(id_sinistre=20, date_fermeture="2026-01-01", raison=1)
+        self.mirror.add_list_row({"id": 50, "statut": 1})
+
+        self.mirror.upsert_list(perimees, generation=generation)
+        self.assertEqual(self.mirror.mark_list_synced({10, 20, 30}, generation), 0)
+        self.assertEqual([s["statut"] for s in self.mirror.list_page()], [1, 1, 0, 1])
+        self.assertTrue(app.mirror_list_fresh())
+
+        self.mirror.upsert_list(self.sinistres, generation=self.mirror.generation)
+        self.assertEqual(self.mirror.mark_list_synced({10, 20, 30}, self.mirror.generation), 1)
+
+    async def test_sinistres_disparus_supprimes(self):
+        await app.sync_mirror()
+        self.sinistres = [s for s in self.sinistres if s["id"] != 20]
+
+        result = await app.sync_mirror()
+        self.assertEqual(result["pruned"], 1)
+        self.assertEqual([s["id"] for s in self.mirror.list_page()], [30, 10])
+        self.assertIsNone(self.mirror.resolve("R20"))
+
+    async def test_ordre_de_sydia_conserve(self):
+        await app.sync_mirror()
+        self.assertEqual([s["id"] for s in self.mirror.list_page()], [30, 20, 10])
+
+        self.sinistres.insert(0, {"id": 40, "ref_assureur": "R40", "statut": 1})
+        await app.sync_mirror()
+        self.assertEqual([s["id"] for s in self.mirror.list_page(limit=2, offset=1)], [30, 20])
+
+    def test_miroir_existant_migre(self):
+        path = os.path.join(self.tmp.name, "ancien.db")
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE sinistres (id INTEGER PRIMARY KEY, id_assure INTEGER, statut INTEGER, "
+                   "list_json TEXT, list_hash TEXT, detail_json TEXT, detail_synced_at REAL)")
+        db.commit()
+        db.close()
+
+        mirror = app.SinistreMirror(path)
+        mirror.upsert_list([{"id": 2}, {"id": 1}])
+        self.assertEqual([s["id"] for s in mirror.list_page()], [2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
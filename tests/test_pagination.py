@@ -0,0 +1,94 @@
+import unittest
+
+from support import FakeSydia, app, reset_state
+
+
+SINISTRES = [{"id": 1000 + i, "ref_assureur": f"R{i}", "statut": 1 if i % 3 else 0} for i in range(1200)]
+OUVERTS = sum(1 for s in SINISTRES if s["statut"] == 1)
+
+
+def ignore_pagination(data):
+    """Sydia qui renvoie toujours toute la liste"""
+    return {"status": 200, "data": SINISTRES}
+
+
+def paginate(data):
+    """Sydia qui respecte limit/offset/statut et renvoie un total"""
+    rows = [s for s in SINISTRES if "statut" not in data or str(s["statut"]) == data["statut"]]
+    offset = int(data.get("offset", 0))
+    return {"status": 200, "data": rows[offset:offset + int(data.get("limit", len(rows)))], "total": len(rows)}
+
+
+def ignore_offset(data):
+    """Sydia qui respecte limit mais pas offset, sans total"""
+    return {"status": 200, "data": SINISTRES[:int(data.get("limit", len(SINISTRES)))]}
+
+
+class PaginationTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        reset_state()
+
+    def sydia(self, handler) -> FakeSydia:
+        sydia = FakeSydia({"sinistre/list": handler})
+        sydia.install()
+        return sydia
+
+    async def pages(self, page_size=500) -> list:
+        return [page async for page in app.iter_sinistres(page_size=page_size, use_mirror=False)]
+
+    async def test_pagination_ignoree_un_seul_telechargement(self):
+        sydia = self.sydia(ignore_pagination)
+        pages = await self.pages()
+        self.assertEqual([len(p) for p in pages], [500, 500, 200])
+        self.assertEqual([s for p in pages for s in p], SINISTRES)
+        self.assertEqual(sydia.count("sinistre/list"), 1)
+
+    async def test_pagination_ignoree_page_decoupee(self):
+        self.sydia(ignore_pagination)
+        result = await app.list_sinistres(limit=50, offset=100, use_mirror=False)
+        self.assertEqual(result["data"], SINISTRES[100:150])
+        self.assertEqual(result["total"], len(SINISTRES))
+
+    async def test_pagination_ignoree_comptage_en_un_appel(self):
+        sydia = self.sydia(ignore_pagination)
+        counts = await app.count_sinistres()
+        self.assertEqual(counts, {"success": True, "total": 1200, "open": OUVERTS, "closed": 1200 - OUVERTS})
+        self.assertEqual(sydia.count("sinistre/list"), 1)
+
+    async def test_pagination_ignoree_tableau_de_bord_en_un_appel(self):
+        sydia = self.sydia(ignore_pagination)
+        await app.sinistres_overview(limit=50)  # première requête : la pagination ignorée est détectée
+        sydia.calls.clear()
+
+        result = await app.sinistres_overview(limit=50, offset=50)
+        self.assertTrue(result["success"])
+        self.assertEqual(result["total"], 1200)
+        self.assertEqual([s["id"] for s in result["sinistres"]], [s["id"] for s in SINISTRES[50:100]])
+        self.assertEqual(sydia.calls, [("sinistre/list", {})])
+
+    async def test_pagination_respectee(self):
+        sydia = self.sydia(paginate)
+        pages = await self.pages()
+        self.assertEqual([s for p in pages for s in p], SINISTRES)
+        self.assertEqual([c[1].get("offset") for c in sydia.calls], [None, "500", "1000"])
+
+        sydia.calls.clear()
+        counts = await app.count_sinistres()
+        self.assertEqual((counts["total"], counts["open"]), (1200, OUVERTS))
+        self.assertEqual([c[1] for c in sydia.calls], [{"limit": "1"}, {"limit": "1", "statut": "1"}])
+
+    async def test_offset_ignore_liste_complete_redemandee(self):
+        sydia = self.sydia(ignore_offset)
+        pages = await self.pages()
+        self.assertEqual([s for p in pages for s in p], SINISTRES)
+        self.assertEqual([c[1] for c in sydia.calls], [{"limit": "500"}, {"limit": "500", "offset": "500"}, {}])
+
+    async def test_offset_ignore_comptage_complet(self):
+        self.sydia(ignore_offset)
+        counts = await app.count_sinistres()
+        self.assertEqual((counts["total"], counts["open"]), (1200, OUVERTS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from support import FakeSydia, app, reset_state
+
+
+class PrefetcherTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.release = asyncio.Event()
+        self.sydia = FakeSydia({
+            "ged/list": lambda data: self.lent({"count": 0, "geds": []}),
+            "sinistre/checklist/get": lambda data: self.lent({}),
+            "sinistre/reglement/list": lambda data: {"status": 200, "data": []},
+        })
+        self.sydia.install()
+        self.prefetcher = app.Prefetcher(concurrency=4, max_pending=10, max_sessions=2)
+
+    async def lent(self, result):
+        await self.release.wait()
+        return {"status": 200, "data": result}
+
+    async def test_donnees_du_sinistre_seulement(self):
+        self.prefetcher.schedule(5, session_id="s1")
+        self.release.set()
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self.sydia.count("ged/list"), 1)
+        self.assertEqual(self.sydia.count("sinistre/checklist/get"), 1)
+        self.assertEqual(self.sydia.count("sinistre/reglement/list"), 0)
+        self.assertEqual(self.prefetcher.pending(), 0)
+
+    async def test_changement_de_sinistre_annule_le_precedent(self):
+        self.prefetcher.schedule(5, session_id="s1")
+        await asyncio.sleep(0)
+        tasks = set(self.prefetcher._tasks[5])
+
+        self.prefetcher.schedule(6, session_id="s1")
+        await asyncio.sleep(0)
+        self.assertTrue(all(t.cancelled() for t in tasks))
+        self.assertEqual(set(self.prefetcher._tasks), {6})
+
+    async def test_sinistre_partage_non_annule(self):
+        self.prefetcher.schedule(5, session_id="s1")
+        self.prefetcher.schedule(5, session_id="s2")
+        self.prefetcher.schedule(6, session_id="s1")
+        await asyncio.sleep(0)
+        self.assertEqual(set(self.prefetcher._tasks), {5, 6})
+        self.prefetcher.cancel()
+
+    async def test_session_transmise_par_chat(self):
+        with mock.patch.object(app, "PREFETCH_ENABLED", True), \
+                mock.patch.object(app, "prefetcher", self.prefetcher), \
+                mock.patch.object(app, "get_sinistre", mock.AsyncMock(return_value={
+                    "success": True, "data": {"id": 5, "ref_assureur": "R5", "assure": {"id": 9}}})):
+            app._session_id.set("s1")
+            await app.execute_tool("identifier_assure", {"ref_sinistre": "R5"})
+        self.assertEqual(self.prefetcher._sessions, {"s1": 5})
+        self.prefetcher.cancel()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+
+from support import FakeSydia, app, reset_state
+
+
+class DashboardStatsTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.sinistres = [{"id": 1, "statut": 1, "type_sinistre": 1}, {"id": 2, "statut": 1, "type_sinistre": 2}]
+        self.sydia = FakeSydia({
+            "sinistre/list": lambda data: {"status": 200, "data": list(self.sinistres)},
+            "sinistre/cloturer": self.cloturer,
+            "ged/add": lambda data: {"status": 200, "id_ged": 1},
+            "sinistre/contact": lambda data: {"status": 200, "id_tache": 1},
+        })
+        self.sydia.install()
+
+    def cloturer(self, data):
+        self.sinistres = [{**s, "statut": 0} if str(s["id"]) == data["id_sinistre"] else s for s in self.sinistres]
+        return {"status": 200, "id_sinistre": int(data["id_sinistre"])}
+
+    async def test_valeur_servie_depuis_le_cache(self):
+        first = await app.dashboard_stats()
+        second = await app.dashboard_stats()
+        self.assertEqual((first["total"], first["open"]), (2, 2))
+        self.assertEqual(second["computed_at"], first["computed_at"])
+        self.assertEqual(self.sydia.count("sinistre/list"), 1)
+
+    async def test_cloture_recalcul_en_tache_de_fond(self):
+        await app.dashboard_stats()
+        release = asyncio.Event()
+
+        async def slow_list(data):
+            snapshot = list(self.sinistres)
+            await release.wait()
+            return {"status": 200, "data": snapshot}
+
+        self.sydia.handlers["sinistre/list"] = slow_list
+        await app.cloturer_sinistre(id_sinistre=1, date_fermeture="2026-01-01", raison=1)
+
+        stats = await asyncio.wait_for(app.dashboard_stats(), 0.5)  # sans attendre le recalcul
+        self.assertEqual((stats["open"], stats["stale"]), (2, True))
+
+        release.set()
+        await app.stats_cache.refresh()
+        stats = await app.dashboard_stats()
+        self.assertEqual((stats["open"], stats["closed"], stats["stale"]), (1, 1, False))
+
+    async def test_document_et_contact_sans_recalcul(self):
+        await app.dashboard_stats()
+        await app.add_document(1, "note.txt", content=b"texte")
+        await app.contact_gestionnaire(1, 2, "Question")
+
+        stats = await app.dashboard_stats()
+        self.assertFalse(stats["stale"])
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.sydia.count("sinistre/list"), 1)
+
+    async def test_calcul_lance_avant_l_ecriture_ignore(self):
+        release = asyncio.Event()
+
+        async def slow_list(data):
+            snapshot = list(self.sinistres)
+            await release.wait()
+            return {"status": 200, "data": snapshot}
+
+        self.sydia.handlers["sinistre/list"] = slow_list
+        before = app.stats_cache.refresh()
+        await asyncio.sleep(0.01)
+        await app.cloturer_sinistre(id_sinistre=1, date_fermeture="2026-01-01", raison=1)
+        release.set()
+        await before
+
+        stats = await app.dashboard_stats()
+        self.assertEqual(stats["open"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
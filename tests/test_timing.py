@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from support import FakeSydia, app, reset_state
+
+
+class ServerTimingTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.sydia = FakeSydia({
+            "sinistre/get": self.lent,
+            "ged/list": self.lent,
+            "sinistre/checklist/get": self.lent,
+        })
+        self.sydia.install()
+
+    async def lent(self, data):
+        await asyncio.sleep(0.05)
+        return {"status": 200, "data": {}}
+
+    async def test_appel_fusionne_compte_pour_chaque_requete(self):
+        first, second = app.ServerTiming(), app.ServerTiming()
+
+        async def joined():
+            await asyncio.sleep(0.02)
+            return await second.run(app.sydia_call("sinistre/get", {"id_sinistre": "5"}))
+
+        await asyncio.gather(first.run(app.sydia_call("sinistre/get", {"id_sinistre": "5"})), joined())
+
+        self.assertEqual(self.sydia.count("sinistre/get"), 1)
+        self.assertGreaterEqual(first.durations["sydia"], 0.045)
+        self.assertGreaterEqual(second.durations["sydia"], 0.025)
+        self.assertLess(second.durations["sydia"], first.durations["sydia"])
+
+    async def test_appel_partage_non_impute_a_l_initiateur_annule(self):
+        first, second = app.ServerTiming(), app.ServerTiming()
+        task = asyncio.ensure_future(first.run(app.sydia_call("sinistre/get", {"id_sinistre": "5"})))
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        await second.run(app.sydia_call("sinistre/get", {"id_sinistre": "5"}))
+        self.assertLess(first.durations["sydia"], 0.03)
+        self.assertGreaterEqual(second.durations["sydia"], 0.03)
+
+    async def test_prechargement_non_impute(self):
+        timing = app.ServerTiming()
+        prefetcher = app.Prefetcher(concurrency=2, max_pending=10, max_sessions=10)
+
+        async def request():
+            prefetcher.schedule(5)
+            await asyncio.gather(*prefetcher._tasks[5])
+
+        with mock.patch.object(app, "prefetcher", prefetcher):
+            await timing.run(request())
+
+        self.assertEqual(self.sydia.count("ged/list"), 1)
+        self.assertNotIn("sydia", timing.durations)
+
+
+if __name__ == "__main__":
+    unittest.main()
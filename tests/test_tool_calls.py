@@ -0,0 +1,53 @@
+import json
+import asyncio
+import unittest
+from unittest import mock
+
+from support import app, reset_state
+
+
+def tool_call(i: int, name: str, **arguments) -> dict:
+    return {"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+class ExecuteToolCallsTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        reset_state()
+        self.running = set()
+        self.peak = 0
+        self.overlaps = {}
+
+    async def fake_tool(self, name, arguments):
+        self.running.add(arguments["n"])
+        self.peak = max(self.peak, len(self.running))
+        self.overlaps[arguments["n"]] = set(self.running)
+        await asyncio.sleep(0.02 * (3 - arguments["n"] % 3))  # les premiers finissent en dernier
+        self.running.discard(arguments["n"])
+        return f"{name} {arguments['n']}"
+
+    async def test_lectures_en_parallele_resultats_dans_l_ordre(self):
+        calls = [tool_call(n, "get_sinistre", n=n) for n in range(6)]
+        with mock.patch.object(app, "execute_tool", self.fake_tool), mock.patch.object(app, "TOOL_CONCURRENCY", 3):
+            results = await app.execute_tool_calls(calls)
+
+        self.assertEqual(results, [f"get_sinistre {n}" for n in range(6)])
+        self.assertEqual(self.peak, 3)
+
+    async def test_ecriture_executee_seule(self):
+        calls = [
+            tool_call(0, "get_sinistre", n=0),
+            tool_call(1, "get_sinistre", n=1),
+            tool_call(2, "cloturer_sinistre", n=2),
+            tool_call(3, "get_sinistre", n=3),
+        ]
+        with mock.patch.object(app, "execute_tool", self.fake_tool):
+            results = await app.execute_tool_calls(calls)
+
+        self.assertEqual(results, ["get_sinistre 0", "get_sinistre 1", "cloturer_sinistre 2", "get_sinistre 3"])
+        self.assertEqual(self.overlaps[2], {2})
+        self.assertNotIn(2, self.overlaps[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
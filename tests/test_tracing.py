@@ -0,0 +1,101 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+from support import FakeSydia, app, reset_state
+
+
+def tool_call(i: int, name: str, **arguments) -> dict:
+    return {"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def attributes(span: dict) -> dict:
+    return {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+
+
+class TraceTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "traces.jsonl")
+        self.exporter = app.TraceExporter(jsonl_path=self.path)
+        self.prefetcher = app.Prefetcher(concurrency=2, max_pending=10, max_sessions=10)
+        for patcher in (
+            mock.patch.object(app, "trace_exporter", self.exporter),
+            mock.patch.object(app, "prefetcher", self.prefetcher),
+            mock.patch.object(app, "PREFETCH_ENABLED", True),
+            mock.patch.object(app, "get_azure_client", lambda: None),
+            mock.patch.object(app, "complete", self.complete),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.sydia = FakeSydia({
+            "sinistre/get": self.lent({"id": 5, "ref_assureur": "R5", "statut": 1, "assure": {"id": 9}}),
+            "ged/list": self.lent({"count": 0, "geds": []}),
+            "sinistre/checklist/get": self.lent({"checklist": []}),
+        })
+        self.sydia.install()
+        self.rounds = [
+            {"role": "assistant", "content": None, "tool_calls": [
+                tool_call(0, "identifier_assure", ref_sinistre="R5"),
+                tool_call(1, "get_sinistre", id_sinistre=5),
+                tool_call(2, "get_sinistre", id_sinistre=5),
+            ]},
+            {"role": "assistant", "content": "Dossier trouvé"},
+        ]
+
+    def lent(self, data):
+        async def handler(request):
+            await asyncio.sleep(0.02)
+            return {"status": 200, "data": data}
+        return handler
+
+    async def complete(self, llm, messages, on_delta=None, **kwargs):
+        return self.rounds.pop(0)
+
+    async def spans(self) -> list:
+        await asyncio.gather(*(t for tasks in list(self.prefetcher._tasks.values()) for t in tasks))
+        await asyncio.to_thread(self.exporter.shutdown)
+        spans = []
+        with open(self.path) as f:
+            for line in f:
+                for resource in json.loads(line)["resourceSpans"]:
+                    for scope in resource["scopeSpans"]:
+                        spans += scope["spans"]
+        return spans
+
+    async def test_tour_trace(self):
+        stats = {}
+        self.assertEqual(await app.chat("s1", "Bonjour", stats=stats), "Dossier trouvé")
+        spans = await self.spans()
+        by_id = {s["spanId"]: s for s in spans}
+
+        root = [s for s in spans if "parentSpanId" not in s]
+        self.assertEqual([s["name"] for s in root], ["chat"])
+        self.assertEqual({s["traceId"] for s in spans}, {root[0]["traceId"]})
+        for s in spans:
+            self.assertEqual(attributes(s)["session_id"], "s1")
+            self.assertEqual(attributes(s)["turn_id"], stats["turn_id"])
+
+        def parent(s):
+            return by_id[s["parentSpanId"]]["name"]
+
+        self.assertEqual(sorted(s["name"] for s in spans if s is not root[0] and parent(s) == "chat"),
+                         ["execute_tool"] * 3 + ["llm"] * 2)
+        sydia = [s for s in spans if s["name"] == "sydia_call"]
+        self.assertEqual({parent(s) for s in sydia}, {"execute_tool"})
+        self.assertEqual(sorted(attributes(s)["coalesced"] for s in sydia), [False, False, True])
+
+        # Ni l'appel partagé ni les préchargements n'ont de span
+        self.assertEqual(len(sydia), 3)
+        self.assertEqual(self.sydia.count("ged/list"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import io
+import base64
+import pathlib
+import tempfile
+import unittest
+
+from support import FakeSydia, app, reset_state
+
+
+class AddDocumentTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        reset_state()
+        self.sydia = FakeSydia({"ged/add": lambda data: {"status": 200, "id_ged": 1, "id_assure": 9}})
+        self.sydia.install()
+
+    def sent(self) -> bytes:
+        return base64.b64decode(self.sydia.calls[-1][1]["content"])
+
+    async def test_bytes(self):
+        result = await app.add_document(5, "note.txt", content=b"contenu")
+        self.assertTrue(result["success"])
+        self.assertEqual(self.sent(), b"contenu")
+
+    async def test_chemin(self):
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+            f.write(b"%PDF" * 1000)
+            f.flush()
+            await app.add_document(5, "doc.pdf", content=pathlib.Path(f.name))
+        self.assertEqual(self.sent(), b"%PDF" * 1000)
+
+    async def test_lectures_courtes(self):
+        class ShortReads(io.RawIOBase):
+            """Flux brut qui renvoie au plus 7 octets par lecture"""
+
+            def __init__(self, data):
+                self.data = io.BytesIO(data)
+
+            def readable(self):
+                return True
+
+            def read(self, size=-1):
+                return self.data.read(min(size, 7))
+
+        content = bytes(range(256)) * 40
+        await app.add_document(5, "doc.bin", content=ShortReads(content))
+        self.assertEqual(self.sent(), content)
+        chunks = [c async for c in app.upload_chunks(ShortReads(content))]
+        self.assertTrue(all(len(c) % 3 == 0 for c in chunks[:-1]))
+
+    async def test_chaine_refusee(self):
+        with self.assertRaises(TypeError):
+            await app.add_document(5, "note.txt", content="/etc/passwd")
+        self.assertEqual(self.sydia.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()